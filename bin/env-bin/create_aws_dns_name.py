@@ -5,8 +5,9 @@ import sys
 import dotenv
 import argparse
 import json
-import boto3
+import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from typing import Dict, List
 
@@ -17,17 +18,24 @@ from tp_hub import (
     install_docker_compose,
     docker_compose_is_installed,
     create_docker_network,
-    create_docker_volume,
+    create_docker_volumes,
+    prefetch_docker_state,
     should_run_with_group,
     get_public_ipv4_egress_address,
+    get_internet_ipv4_route_info,
     get_gateway_lan_ip4_address,
     get_lan_ipv4_address,
     get_default_ipv4_interface,
     logger,
+    buffer_stderr,
+    emit,
   )
 
 def main() -> int:
+    buffer_stderr()
+
     parser = argparse.ArgumentParser(description="Create a DNS name on AWS")
+    parser.add_argument("--force", "-f", action="store_true", help="Force clean installation of prerequisites")
     parser.add_argument( '--loglevel', type=str.lower, default='warning',
                 choices=['debug', 'info', 'warning', 'error', 'critical'],
                 help='Provide logging level. Default="warning"' )
@@ -41,48 +49,58 @@ def main() -> int:
 
     dns_name: str = args.dns_name
 
-
-
     force: bool = args.force
 
     username = os.environ["USER"]
 
-    # Install docker
-    if not docker_is_installed() or args.force:
+    # Install docker. A $PATH lookup is enough to know docker is already installed; the
+    # subprocess-based probe is only needed when it isn't found there.
+    if force or (shutil.which("docker") is None and not docker_is_installed()):
         install_docker(force=force)
 
     # Install docker-compose
-    if not docker_compose_is_installed() or args.force:
+    if force or (shutil.which("docker-compose") is None and not docker_compose_is_installed()):
         install_docker_compose(force=force)
 
+    # Fetch the existing docker networks and volumes in one concurrent batch
+    prefetch_docker_state()
+
     # Create the "traefik" network if it doesn't exist:
     create_docker_network("traefik")
 
-    # Create The "traefik_acme" volume if it doesn't exist:
-    create_docker_volume("traefik_acme")
-
-    # Create the "portainer_data" volume if it doesn't exist:
-    create_docker_volume("portainer_data")
-
-    public_ip_addr = get_public_ipv4_egress_address()
+    # Create the "traefik_acme" and "portainer_data" volumes if they don't exist:
+    create_docker_volumes(["traefik_acme", "portainer_data"])
+
+    # The public IP lookup (an HTTP request) and the default route lookup (an "ip route" subprocess)
+    # are independent, so run them concurrently. The LAN address, gateway address, and default interface
+    # are all derived from the cached default route info.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        public_ip_addr_future = executor.submit(get_public_ipv4_egress_address, force_refresh=force)
+        route_info_future = executor.submit(get_internet_ipv4_route_info)
+        public_ip_addr = public_ip_addr_future.result()
+        route_info_future.result()
     gateway_lan_ip_addr = get_gateway_lan_ip4_address()
     lan_ip_addr = get_lan_ipv4_address()
     default_interface = get_default_ipv4_interface()
 
-    print(file=sys.stderr)
-    print(f"Default interface: {default_interface}", file=sys.stderr)
-    print(f"Gateway LAN IP address: {gateway_lan_ip_addr}", file=sys.stderr)
-    print(f"Public IP address: {public_ip_addr}", file=sys.stderr)
-    print(f"LAN IP address: {lan_ip_addr}", file=sys.stderr)
-
+    lines: List[str] = [
+        "",
+        f"Default interface: {default_interface}",
+        f"Gateway LAN IP address: {gateway_lan_ip_addr}",
+        f"Public IP address: {public_ip_addr}",
+        f"LAN IP address: {lan_ip_addr}",
+      ]
 
     if should_run_with_group("docker"):
-        print("\nWARNING: docker and docker-compose require membership in OS group 'docker', which was newly added for", file=sys.stderr)
-        print(f"user \"{username}\", and is not yet effective for the current login session. Please logout", file=sys.stderr)
-        print("and log in again, or in the mean time run docker with:\n", file=sys.stderr)
-        print(f"      sudo -E -u {username} docker [<arg>...]", file=sys.stderr)
-
-    print("\nPrerequisites installed successfully", file=sys.stderr)
+        lines.extend([
+            "\nWARNING: docker and docker-compose require membership in OS group 'docker', which was newly added for",
+            f"user \"{username}\", and is not yet effective for the current login session. Please logout",
+            "and log in again, or in the mean time run docker with:\n",
+            f"      sudo -E -u {username} docker [<arg>...]",
+          ])
+
+    lines.append("\nPrerequisites installed successfully")
+    emit(*lines)
 
     return 0
 
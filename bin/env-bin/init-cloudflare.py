@@ -18,12 +18,12 @@ import argparse
 import json
 import logging
 import re
+import hashlib
 import subprocess
-import CloudFlare
-import yaml
-import urllib3
+import tempfile
 import time
-from CloudFlare.exceptions import CloudFlareAPIError
+from functools import cache, lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 from tp_hub import (
     Jsonable, JsonableDict, JsonableList,
@@ -38,10 +38,19 @@ from tp_hub import (
     is_valid_dns_name,
     atomic_mv,
     raw_resolve_public_dns,
+    buffer_stderr,
+    emit,
   )
 
 from tp_hub.internal_types import *
 
+# CloudFlare, yaml and urllib3 are slow to import, so they are imported in main() after
+# the command line has been parsed; e.g., "--help" does not need them.
+if TYPE_CHECKING:
+    import CloudFlare
+    import yaml
+    import urllib3
+
 
 from project_init_tools import get_git_user_email, sudo_check_output_stderr_exception, sudo_call, sudo_check_call, CalledProcessErrorWithStderrMessage
 from project_init_tools.util import sudo_check_call_stderr_exception, command_exists
@@ -53,38 +62,207 @@ def prompt_value(prompt: str, default: Optional[str]=None) -> str:
     else:
         prompt = f"{prompt} [{default}]: "
 
-    print("", file=sys.stderr)
+    # The leading blank line and the prompt are written together, in a single write
+    sys.stderr.write(f"\n{prompt}")
+    sys.stderr.flush()
     while True:
-        value = input(prompt)
-        if value == "":
-            if default is None:
-                print("A value is required; please try again")
-            else:
-                value = default
-        return value
+        value = input()
+        if value != "":
+            return value
+        if default is not None:
+            return default
+        sys.stderr.write(f"A value is required; please try again\n{prompt}")
+        sys.stderr.flush()
     
+_yes_answers = frozenset([ "y", "yes", "true", "t", "1" ])
+_no_answers = frozenset([ "n", "no", "false", "f", "0" ])
+
 def prompt_yes_no(prompt: str, default: Optional[bool]=None) -> bool:
     while True:
         answer = prompt_value(prompt, default=None if default is None else ("Y" if default else "N")).lower()
-        if answer in [ "y", "yes", "true", "t", "1" ]:
+        if answer in _yes_answers:
             return True
-        elif answer in [ "n", "no", "false", "f", "0" ]:
+        elif answer in _no_answers:
             return False
         print("Please answer 'y' or 'n'", file=sys.stderr)
 
+@lru_cache(maxsize=512)
 def expand_dns_name(name: str, parent_dns_domain: str) -> str:
-    if '.' in name:
-        return name
-    return f"{name}.{parent_dns_domain}"
+    return name if '.' in name else name + "." + parent_dns_domain
 
+@lru_cache(maxsize=512)
 def shrink_dns_name(name: str, parent_dns_domain: str) -> str:
-    if name.endswith(f".{parent_dns_domain}"):
-        return name[:-len(f".{parent_dns_domain}")]
-    return name
+    return name.removesuffix("." + parent_dns_domain)
+
+cache_ttl_seconds = 30.0
+"""How long results cached in .cloudflare/cache are used without refetching"""
 
-api_key_re = re.compile(r"^[a-f0-9]{37}$")
+creds_verification_ttl_seconds = 24 * 60 * 60.0
+"""How long a successful Cloudflare credential check is trusted before the credentials are checked again"""
+
+api_key_re = re.compile(r"[a-f0-9]{37}")
 def is_valid_api_key(api_key: str) -> bool:
-    return api_key_re.match(api_key) is not None
+    return api_key_re.fullmatch(api_key) is not None
+
+# Validation results are memoized, since the same answers are re-validated on retry loops
+_is_valid_email_address = lru_cache(maxsize=128)(is_valid_email_address)
+_is_valid_dns_name = lru_cache(maxsize=128)(is_valid_dns_name)
+
+def _rm_f(pathname: str) -> None:
+    """
+    Remove a file if it exists, like "rm -f".
+    """
+    try:
+        os.unlink(pathname)
+    except FileNotFoundError:
+        pass
+
+def get_cache_key(*parts: str) -> str:
+    """
+    Get a disk cache key that is unique to the given parts (e.g., a kind of data and the
+    credentials used to fetch it), without exposing the parts in the cache file name.
+    """
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+def get_cache_pathname(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.json")
+
+def read_cache_entry(cache_dir: str, key: str) -> Optional[Tuple[float, Jsonable]]:
+    """
+    Read a cached value from disk. Returns a tuple (timestamp, value), or None if there is no
+    valid entry for the key.
+    """
+    try:
+        with open(get_cache_pathname(cache_dir, key), "r", encoding='utf-8') as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(entry, dict) or "timestamp" not in entry or "value" not in entry:
+        return None
+    return entry["timestamp"], entry["value"]
+
+def write_cache_entry(cache_dir: str, key: str, value: Jsonable) -> None:
+    """
+    Write a value to the disk cache, timestamped with the current time.
+    """
+    cache_file = get_cache_pathname(cache_dir, key)
+    tmp_cache_file = cache_file + ".tmp"
+    _rm_f(tmp_cache_file)
+    try:
+        with open(os.open(tmp_cache_file, os.O_CREAT | os.O_WRONLY, 0o600), "w", encoding='utf-8') as f:
+            json.dump(dict(timestamp=time.time(), value=value), f)
+        atomic_mv(tmp_cache_file, cache_file, force=True)
+    finally:
+        _rm_f(tmp_cache_file)
+
+def invalidate_cache_entry(cache_dir: str, key: str) -> None:
+    """
+    Remove a value from the disk cache, if present.
+    """
+    cache_file = get_cache_pathname(cache_dir, key)
+    _rm_f(cache_file)
+
+def cached_fetch(
+        cache_dir: str,
+        key: str,
+        fetch: Callable[[], Jsonable],
+        ttl: float=cache_ttl_seconds,
+        fallback_errors: Tuple[Type[BaseException], ...]=(),
+        is_fatal_error: Optional[Callable[[BaseException], bool]]=None,
+      ) -> Jsonable:
+    """
+    Return the value cached on disk under key if it is less than ttl seconds old. Otherwise,
+    call fetch() and cache its result.
+
+    If fetch() raises one of fallback_errors and a stale cached value exists, the stale value
+    is returned rather than propagating the error, unless is_fatal_error(error) returns True.
+    """
+    entry = read_cache_entry(cache_dir, key)
+    if entry is not None and time.time() - entry[0] < ttl:
+        return entry[1]
+    try:
+        value = fetch()
+    except fallback_errors as e:
+        if entry is None or (is_fatal_error is not None and is_fatal_error(e)):
+            raise
+        logger.warning(f"Using stale cached result after error: {e}")
+        return entry[1]
+    write_cache_entry(cache_dir, key, value)
+    return value
+
+public_dns_resolver_urls: List[str] = [
+    "https://dns.google/resolve",
+    "https://cloudflare-dns.com/dns-query",
+  ]
+"""Public DNS-over-HTTPS resolvers used to check name server delegation"""
+
+def get_public_ns_set(zone_name: str, resolver_url: str) -> Set[str]:
+    """
+    Get the set of name servers for a zone, as seen by a public DNS resolver.
+    Each name is fully qualified, with a trailing '.'.
+    """
+    ns_record_info = raw_resolve_public_dns(zone_name, 'NS', resolver_url=resolver_url)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Current name server record info for this zone from %s: %s", resolver_url, json.dumps(ns_record_info, indent=2, sort_keys=True))
+    actual_ns_set : Set[str] = set()
+    if 'Answer' in ns_record_info:
+        answer_list = ns_record_info['Answer']
+        assert isinstance(answer_list, list)
+        for answer in answer_list:
+            assert isinstance(answer, dict)
+            if 'data' in answer and answer.get('type') == 2 and answer.get('name') == zone_name+'.':
+                ns = answer['data'].lower()
+                if not ns.endswith('.'):
+                    ns += '.'
+                actual_ns_set.add(ns)
+    return actual_ns_set
+
+tunnel_test_timeout_seconds = 30.0
+"""How long to wait for the tunnel test URL to respond after (re)starting cloudflared"""
+
+tunnel_test_content = b"Congrats! You created a tunnel!"
+"""Content expected in the response from the cloudflared "hello-world" test service"""
+
+@cache
+def get_tunnel_test_http() -> urllib3.PoolManager:
+    """
+    Get a shared connection pool for testing the tunnel, which retries requests that fail
+    while the tunnel is starting.
+    """
+    import urllib3
+    return urllib3.PoolManager(
+        retries=urllib3.Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+          ),
+        timeout=urllib3.Timeout(connect=2.0, read=5.0),
+      )
+
+def is_invalid_creds_error(e: BaseException) -> bool:
+    """
+    Return True if e is the Cloudflare API error for an invalid login email address or API key.
+    """
+    from CloudFlare.exceptions import CloudFlareAPIError
+    return isinstance(e, CloudFlareAPIError) and e.code == 9103
+
+def get_yaml_safe_dumper() -> Type[yaml.SafeDumper]:
+    """
+    Get the libyaml-based safe YAML dumper if PyYAML was built with libyaml, else the pure Python one.
+    """
+    import yaml
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+def list_cloudflared_tunnels() -> List[JsonableDict]:
+    """
+    List the Cloudflare tunnels visible to the locally logged-in cloudflared tool.
+    """
+    # json.loads() detects the encoding of raw bytes itself, which avoids decoding a copy first
+    tunnel_infos_content = sudo_check_output_stderr_exception(["cloudflared", "tunnel", "list", "-o", "json"], use_sudo=False)
+    tunnel_infos: List[JsonableDict] = json.loads(tunnel_infos_content)
+    return tunnel_infos
 
 '''
 def cloudflared_login(cf: CloudFlare.CloudFlare, email: str, api_key: str) -> None:
@@ -95,6 +273,19 @@ def get_local_tunnels(cf: CloudFlare.CloudFlare) -> List[JsonableDict]:
 
 
 def main() -> int:
+    # The zone list, the cloudflared tunnel list, and (once the zone is known) the zone's existing
+    # DNS records and public name server records are independent fetches, so they are started in
+    # the background and only awaited where they are consumed. On an early return or error,
+    # fetches that have not started yet are cancelled.
+    executor = ThreadPoolExecutor(max_workers=6)
+    try:
+        return _main(executor)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def _main(executor: ThreadPoolExecutor) -> int:
+    buffer_stderr()
+
     parser = argparse.ArgumentParser(description="Install prerequisites for this project")
 
     parser.add_argument( '--loglevel', type=str.lower, default='warning',
@@ -105,10 +296,17 @@ def main() -> int:
     args = parser.parse_args()
     logging.basicConfig(level=args.loglevel.upper())
 
+    import CloudFlare
+    import yaml
+    import urllib3
+    from CloudFlare.exceptions import CloudFlareAPIError
+
     force: bool = args.force
 
     cloudflare_dir = os.path.join(get_project_dir(), ".cloudflare")
     os.makedirs(cloudflare_dir, exist_ok=True, mode=0o700)
+    cache_dir = os.path.join(cloudflare_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True, mode=0o700)
 
     params_file = os.path.join(cloudflare_dir, "params.json")
     if not os.path.exists(params_file):
@@ -120,19 +318,31 @@ def main() -> int:
     params: JsonableDict = json.loads(old_params_content)
     assert isinstance(params, dict)
 
+    params_dirty = False
+
+    def set_param(name: str, value: Jsonable) -> None:
+        nonlocal params_dirty
+        if name not in params or params[name] != value:
+            params[name] = value
+            params_dirty = True
+
     def flush_params() -> None:
+        nonlocal params_dirty
+        if not params_dirty:
+            return
         new_params_content = json.dumps(params, indent=2, sort_keys=True)
-        if new_params_content != old_params_content:
-            tmp_params_file = params_file + ".tmp"
-            if os.path.exists(tmp_params_file):
-                os.unlink(tmp_params_file)
-            try:
-                with open(os.open(tmp_params_file, os.O_CREAT | os.O_WRONLY, 0o600), "w", encoding='utf-8') as f:
-                    f.write(new_params_content)
-                atomic_mv(tmp_params_file, params_file, force=True)
-            finally:
-                if os.path.exists(tmp_params_file):
-                    os.unlink(tmp_params_file)
+        tmp_params_file: Optional[str] = None
+        try:
+            # NamedTemporaryFile creates the file with only this user having access
+            with tempfile.NamedTemporaryFile("w", encoding='utf-8', dir=cloudflare_dir, prefix="params.json.", suffix=".tmp", delete=False) as f:
+                tmp_params_file = f.name
+                f.write(new_params_content)
+            os.replace(tmp_params_file, params_file)
+            tmp_params_file = None
+        finally:
+            if tmp_params_file is not None:
+                _rm_f(tmp_params_file)
+        params_dirty = False
 
     email: Optional[str] = params.get("email")
 
@@ -148,11 +358,11 @@ def main() -> int:
             while True:
                 email = prompt_value(usl(
                     """Please enter the email address associated with your Cloudflare account"""), default=default_email).strip()
-                if not is_valid_email_address(email):
+                if not _is_valid_email_address(email):
                     print("Invalid email address; please try again", file=sys.stderr)
                     continue
                 break
-            params["email"] = email
+            set_param("email", email)
 
         api_key: Optional[str] = params.get("api_key")
         if force_reauth or api_key is None:
@@ -166,14 +376,33 @@ def main() -> int:
                     print("Invalid api_key format; please try again", file=sys.stderr)
                     continue
                 break
-            params["api_key"] = api_key
+            set_param("api_key", api_key)
+
+        cf = CloudFlare.CloudFlare(email=email, key=api_key)
+
+        # Credentials that were checked recently are not checked again; if they have since become
+        # invalid, the zone list fetch below fails with the same error and we fall back to re-prompting.
+        creds_verified_at = params.get("creds_verified_at")
+        creds_recently_verified = (
+            not force_reauth and
+            isinstance(creds_verified_at, (int, float)) and
+            time.time() - creds_verified_at < creds_verification_ttl_seconds
+          )
 
+        zones_cache_key = get_cache_key("zones", email, api_key)
+        tunnels_cache_key = get_cache_key("tunnels", email, api_key)
         try:
-            cf = CloudFlare.CloudFlare(email=email, key=api_key)
-            cf.user.get()
+            if not creds_recently_verified:
+                cf.user.get()
+                set_param("creds_verified_at", time.time())
+            zone_infos_future = executor.submit(
+                cached_fetch, cache_dir, zones_cache_key, cf.zones.get,
+                fallback_errors=(CloudFlareAPIError,), is_fatal_error=is_invalid_creds_error)
+            tunnel_infos_future = executor.submit(cached_fetch, cache_dir, tunnels_cache_key, list_cloudflared_tunnels)
+            zone_infos: List[JsonableDict] = zone_infos_future.result()
             break
         except CloudFlareAPIError as e:
-            if e.code == 9103:
+            if is_invalid_creds_error(e):
                 print("Invalid Cloudflare login email address or API key; please try again", file=sys.stderr)
                 force_reauth = True
                 continue
@@ -183,9 +412,11 @@ def main() -> int:
     print(f"Logged in to Cloudflare API successfully with username {email}", file=sys.stderr)
     flush_params()
 
-    zone_infos: List[JsonableDict] = cf.zones.get()
-    zones_by_id = { zone["id"]: zone for zone in zone_infos }
-    zones_by_name = { zone["name"]: zone for zone in zone_infos }
+    zones_by_id: Dict[str, JsonableDict] = {}
+    zones_by_name: Dict[str, JsonableDict] = {}
+    for zone in zone_infos:
+        zones_by_id[zone["id"]] = zone
+        zones_by_name[zone["name"]] = zone
 
     zone_id: Optional[str] = params.get("zone_id")
     zone_info: Optional[JsonableDict] = None if zone_id is None else zones_by_id.get(zone_id)
@@ -198,55 +429,68 @@ def main() -> int:
         if default_zone_name is None and len(zone_infos) > 0:
             default_zone_name = zone_infos[0]["name"]
         if len(zone_infos) == 0:
-            print("No DNS zones found in this this Cloudflare account...", file=sys.stderr)
+            emit("No DNS zones found in this this Cloudflare account...")
         else:
-            print("DNS zones found in this this Cloudflare account:", file=sys.stderr)
-            for zone_name in sorted(zones_by_name.keys()):
-                print(f"  {zone_name}", file=sys.stderr)
+            sorted_zone_names = sorted(zones_by_name)
+            emit("DNS zones found in this this Cloudflare account:", *(f"  {zone_name}" for zone_name in sorted_zone_names))
         while True:
             zone_name = prompt_value(usl(
                 """Enter the Parent DNS Domain that will be managed by Cloudflare and under which subdomain names
                    will be created for use by the hub. You must have administrative control of the domain. If the
                    name you enter is not already set up on Cloudflare, it will be created for you."""), default=default_zone_name).strip()
-            if not is_valid_dns_name(zone_name):
+            if not _is_valid_dns_name(zone_name):
                 print("Invalid DNS name; please try again", file=sys.stderr)
                 continue
-            if not zone_name in zones_by_name:
+            if zone_name not in zones_by_name:
                 should_create = prompt_yes_no(f"DNS zone '{zone_name}' is not currently configured on Cloudflare. Create it now?", default=True)
                 if not should_create:
                     continue
                 new_zone_info = cf.zones.post(data={ "name": zone_name, "type": "full" })
+                invalidate_cache_entry(cache_dir, zones_cache_key)
                 zone_infos.append(new_zone_info)
                 zones_by_id[new_zone_info["id"]] = new_zone_info
                 zones_by_name[new_zone_info["name"]] = new_zone_info
             break
         zone_id = zones_by_name[zone_name]["id"]
-    params["zone_id"] = zone_id
-    params["zone_name"] = zone_name
+    set_param("zone_id", zone_id)
+    set_param("zone_name", zone_name)
 
     zone_info = zones_by_id[zone_id]
-    logger.debug(f"Zone info: {json.dumps(zone_info, indent=2, sort_keys=True)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Zone info: %s", json.dumps(zone_info, indent=2, sort_keys=True))
     print(f"Using DNS zone '{zone_name}' with zone ID '{zone_id}'", file=sys.stderr)
     flush_params()
 
+    wildcard_name = f"*.{zone_name}"
+    dns_records_futures = {
+        record_name: executor.submit(cf.zones.dns_records.get, zone_id, params={ "name": record_name, "type": "CNAME" })
+            for record_name in [ wildcard_name, zone_name ]
+      }
+
     name_servers: List[str] = zone_info["name_servers"]
     assert len(name_servers) > 0 and all(isinstance(ns, str) for ns in name_servers)
     name_servers = list(name_servers)
     for i, ns in enumerate(name_servers):
         if not ns.endswith('.'):
             name_servers[i] = f"{ns}."
-    correct_ns_set = set(name_servers)
-
-    ns_record_info = raw_resolve_public_dns(zone_name, 'NS')
-    logger.debug(f"Current name server record info for this zone: {json.dumps(ns_record_info, indent=2, sort_keys=True)}")
-    actual_ns_set : Set[str] = set()
-    if 'Answer' in ns_record_info:
-        answer_list = ns_record_info['Answer']
-        assert isinstance(answer_list, list)
-        for answer in answer_list:
-            assert isinstance(answer, dict)
-            if 'data' in answer and answer.get('type') == 2 and answer.get('name') == zone_name+'.':
-                actual_ns_set.add(answer['data'])
+    correct_ns_set = set(ns.lower() for ns in name_servers)
+
+    # Ask several public resolvers in parallel. A recently corrected delegation may still be stale
+    # in one resolver's cache, so the delegation is accepted if any resolver sees the correct set.
+    ns_set_futures = [ executor.submit(get_public_ns_set, zone_name, resolver_url) for resolver_url in public_dns_resolver_urls ]
+    ns_sets: List[Set[str]] = []
+    ns_set_error: Optional[Exception] = None
+    for resolver_url, ns_set_future in zip(public_dns_resolver_urls, ns_set_futures):
+        try:
+            ns_sets.append(ns_set_future.result())
+        except Exception as e:
+            logger.warning(f"Failed to query name servers for zone {zone_name} from {resolver_url}: {e}")
+            if ns_set_error is None:
+                ns_set_error = e
+    if len(ns_sets) == 0:
+        assert ns_set_error is not None
+        raise ns_set_error
+    actual_ns_set = next((ns_set for ns_set in ns_sets if ns_set == correct_ns_set), ns_sets[0])
 
     if actual_ns_set != correct_ns_set:
         print(f"The name servers for zone {zone_name} are not yet set for the TLD at the registrar, or are set incorrectly. Please set or correct them and restart this script.", file=sys.stderr)
@@ -269,27 +513,33 @@ def main() -> int:
 
 
 
+    tunnel_infos: List[JsonableDict]
     try:
-        tunnel_infos_content = sudo_check_output_stderr_exception(["cloudflared", "tunnel", "list", "-o", "json"], use_sudo=False).decode('utf-8')
+        tunnel_infos = tunnel_infos_future.result()
     except CalledProcessErrorWithStderrMessage as e:
         print(f"\n\nLogging cloudflared tool in to Cloudflare. If prompted, please navigate to the requested URL, select {zone_name} ans the zone, and confirm.", file=sys.stderr)
+        sys.stderr.flush()
         subprocess.check_call(["cloudflared", "tunnel", "login"])
-        tunnel_infos_content = sudo_check_output_stderr_exception(["cloudflared", "tunnel", "list", "-o", "json"], use_sudo=False).decode('utf-8')
+        tunnel_infos = cached_fetch(cache_dir, tunnels_cache_key, list_cloudflared_tunnels)
 
-    tunnel_infos: List[JsonableDict] = json.loads(tunnel_infos_content)
-    logger.debug(f"tunnel_infos: {json.dumps(tunnel_infos, indent=2, sort_keys=True)}")
-    tunnels_by_id = { tunnel["id"]: tunnel for tunnel in tunnel_infos }
-    tunnels_by_name = { tunnel["name"]: tunnel for tunnel in tunnel_infos }
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("tunnel_infos: %s", json.dumps(tunnel_infos, indent=2, sort_keys=True))
+    tunnels_by_id: Dict[str, JsonableDict] = {}
+    tunnels_by_name: Dict[str, JsonableDict] = {}
+    for tunnel in tunnel_infos:
+        tunnels_by_id[tunnel["id"]] = tunnel
+        tunnels_by_name[tunnel["name"]] = tunnel
 
     if len(tunnel_infos) == 0:
-        print("\nNo Cloudflare tunnels currently exist on this host...", file=sys.stderr)
+        emit("\nNo Cloudflare tunnels currently exist on this host...", "")
     else:
-        print("\nCloudflare tunnels found on this host:", file=sys.stderr)
-        print(f"  {'Name':<40}   ID", file=sys.stderr)
-        print(f"  {'----------------------------------------':<40}   ------------------------------------", file=sys.stderr)
-        for tunnel in tunnel_infos:
-            print(f"  {tunnel['name']:<40}   {tunnel['id']}", file=sys.stderr)
-    print(file=sys.stderr)
+        emit(
+            "\nCloudflare tunnels found on this host:",
+            f"  {'Name':<40}   ID",
+            f"  {'----------------------------------------':<40}   ------------------------------------",
+            *(f"  {tunnel['name']:<40}   {tunnel['id']}" for tunnel in tunnel_infos),
+            "",
+          )
 
     tunnel_id: Optional[str] = params.get("tunnel_id")
     tunnel_info: Optional[JsonableDict] = None if tunnel_id is None else tunnels_by_id.get(tunnel_id)
@@ -306,63 +556,62 @@ def main() -> int:
             if len(tunnel_name) == 0:
                 print("Invalid tunnel name format; please try again", file=sys.stderr)
                 continue
-            if not tunnel_name in tunnels_by_name:
+            if tunnel_name not in tunnels_by_name:
                 should_create = prompt_yes_no(f"Tunnel '{tunnel_name}' is not currently configured on Cloudflare. Create it now?", default=True)
                 if not should_create:
                     continue
-                sudo_check_call_stderr_exception(["cloudflared", "tunnel", "create", tunnel_name], use_sudo=False)
-                tunnel_infos_content = sudo_check_output_stderr_exception(["cloudflared", "tunnel", "list", "-o", "json"], use_sudo=False).decode('utf-8')
-                tunnel_infos = json.loads(tunnel_infos_content)
-                tunnels_by_name = { tunnel["name"]: tunnel for tunnel in tunnel_infos }
-                tunnels_by_id = { tunnel["id"]: tunnel for tunnel in tunnel_infos }
-                tunnel_info = tunnels_by_name[tunnel_name]
+                # "cloudflared tunnel create -o json" describes the new tunnel, so there is no need to list tunnels again
+                tunnel_info = json.loads(sudo_check_output_stderr_exception(
+                    ["cloudflared", "tunnel", "create", "-o", "json", tunnel_name], use_sudo=False))
+                assert isinstance(tunnel_info, dict)
                 tunnel_id = tunnel_info["id"]
+                tunnel_infos.append(tunnel_info)
+                tunnels_by_name[tunnel_info["name"]] = tunnel_info
+                tunnels_by_id[tunnel_id] = tunnel_info
+                write_cache_entry(cache_dir, tunnels_cache_key, tunnel_infos)
                 print(f"Created Cloudflare tunnel '{tunnel_name}' with ID {tunnel_id}", file=sys.stderr)
             break
     tunnel_info = tunnels_by_name[tunnel_name]
     tunnel_id = tunnel_info["id"]
-    params["tunnel_id"] = tunnel_id
-    params["tunnel_name"] = tunnel_name
+    set_param("tunnel_id", tunnel_id)
+    set_param("tunnel_name", tunnel_name)
 
     print(f"Using Cloudflare tunnel '{tunnel_name}' with ID '{tunnel_id}'", file=sys.stderr)
     flush_params()
 
-    wildcard_name = f"*.{zone_name}"
     tunnel_cname = f"{tunnel_id}.cfargotunnel.com"
 
-    # create DNS wildcard record "*.{zone_name}" if needed
-
-    need_dns_update = True
-    dns_records: List[JsonableDict] = cf.zones.dns_records.get(zone_id, params={ "name": wildcard_name, "type": "CNAME" })
-    if len(dns_records) > 0:
-        assert len(dns_records) == 1
-        dns_record = dns_records[0]
-        if dns_record['type'] == 'CNAME' and dns_record['name'] == wildcard_name and dns_record['content'] == tunnel_cname and dns_record['proxied'] == True:
-            print(f"DNS wildcard record '{wildcard_name}' is already set to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
-            need_dns_update = False
-
-    if need_dns_update:
-        print(f"Updating DNS wildcard record '{wildcard_name}' to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
-        cf.zones.dns_records.post(zone_id, data={ "name": wildcard_name, "type": "CNAME", "content": tunnel_cname, "proxied": True })
-        print(f"DNS wildcard record '{wildcard_name}' successfully updated to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
-
-    # create Root domain record "{zone_name}" if needed (allows http(s)://zone_name to work without a subdomain)
+    # create DNS wildcard record "*.{zone_name}" if needed.
+    # Also create Root domain record "{zone_name}" if needed (allows http(s)://zone_name to work without a subdomain)
     # CloudFlare allows us to create a virtual proxied CNAME record for the root domain, which internally is mapped
     # to an A record at DNS query time, since DNS does not allow CNAME records for root domains.
-
-    need_root_dns_update = True
-    root_dns_records: List[JsonableDict] = cf.zones.dns_records.get(zone_id, params={ "name": zone_name, "type": "CNAME" })
-    if len(root_dns_records) > 0:
-        assert len(root_dns_records) == 1
-        root_dns_record = root_dns_records[0]
-        if root_dns_record['type'] == 'CNAME' and root_dns_record['name'] == zone_name and root_dns_record['content'] == tunnel_cname and root_dns_record['proxied'] == True:
-            print(f"DNS root record '{zone_name}' is already set to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
-            need_root_dns_update = False
-
-    if need_root_dns_update:
-        print(f"Updating DNS root record '{zone_name}' to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
-        cf.zones.dns_records.post(zone_id, data={ "name": zone_name, "type": "CNAME", "content": tunnel_cname, "proxied": True })
-        print(f"DNS root record '{zone_name}' successfully updated to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
+    # All needed creates/updates are applied in a single request to Cloudflare's batch DNS records API.
+
+    dns_record_posts: List[JsonableDict] = []
+    dns_record_patches: List[JsonableDict] = []
+    updated_dns_records: List[Tuple[str, str]] = []
+    for record_desc, record_name in [ ("wildcard", wildcard_name), ("root", zone_name) ]:
+        new_dns_record: JsonableDict = { "name": record_name, "type": "CNAME", "content": tunnel_cname, "proxied": True }
+        dns_records: List[JsonableDict] = dns_records_futures[record_name].result()
+        if len(dns_records) > 0:
+            assert len(dns_records) == 1
+            dns_record = dns_records[0]
+            if dns_record['type'] == 'CNAME' and dns_record['name'] == record_name and dns_record['content'] == tunnel_cname and dns_record['proxied'] == True:
+                print(f"DNS {record_desc} record '{record_name}' is already set to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
+                continue
+            dns_record_patches.append(dict(new_dns_record, id=dns_record['id']))
+        else:
+            dns_record_posts.append(new_dns_record)
+        print(f"Updating DNS {record_desc} record '{record_name}' to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
+        updated_dns_records.append((record_desc, record_name))
+
+    if len(updated_dns_records) > 0:
+        if not hasattr(cf.zones.dns_records, "batch"):
+            # Older python-cloudflare releases do not know about the batch endpoint
+            cf.add('AUTH', 'zones', 'dns_records', 'batch')
+        cf.zones.dns_records.batch.post(zone_id, data={ "posts": dns_record_posts, "patches": dns_record_patches })
+        for record_desc, record_name in updated_dns_records:
+            print(f"DNS {record_desc} record '{record_name}' successfully updated to proxy to '{tunnel_cname}' on Cloudflare", file=sys.stderr)
 
     home_dir = os.path.expanduser("~")
     home_cloudflared_dir = os.path.join(home_dir, ".cloudflared")
@@ -371,8 +620,7 @@ def main() -> int:
     home_creds_file = os.path.join(home_cloudflared_dir, creds_filename)
 
     print(f"Updating cloudflared tunnel credentials file {home_creds_file}", file=sys.stderr)
-    if os.path.exists(home_creds_file):
-        os.unlink(home_creds_file)
+    _rm_f(home_creds_file)
     sudo_check_call_stderr_exception(["cloudflared", "tunnel", "token", "--cred-file", home_creds_file, tunnel_id], use_sudo=False)
 
     etc_cloudflared_dir = "/etc/cloudflared"
@@ -384,10 +632,15 @@ def main() -> int:
         sudo_check_call_stderr_exception(["mkdir", "-p", etc_cloudflared_dir], use_sudo=True)
 
     print(f"Copying cloudflared credentials from '{home_cert_pem}' to '{etc_cert_pem}'", file=sys.stderr)
-    sudo_check_call_stderr_exception(["rsync", "-rlptD", "--chmod=F600", home_cert_pem, etc_cert_pem], use_sudo=True)
-
     print(f"Copying cloudflared tunnel credentials from '{home_creds_file}' to '{etc_creds_file}'", file=sys.stderr)
-    sudo_check_call_stderr_exception(["rsync", "-rlptD", "--chmod=F600", home_creds_file, etc_creds_file], use_sudo=True)
+    # A single rsync invocation copies both files, saving a sudo + rsync process startup
+    with tempfile.NamedTemporaryFile("w", encoding='utf-8', prefix="cloudflared-files-", suffix=".txt") as f:
+        f.write(f"{os.path.basename(home_cert_pem)}\n{creds_filename}\n")
+        f.flush()
+        sudo_check_call_stderr_exception(
+            ["rsync", "-rlptD", "--chmod=F600", "--files-from", f.name, home_cloudflared_dir + "/", etc_cloudflared_dir + "/"],
+            use_sudo=True
+          )
 
     expose_ssh = params.get("expose_ssh")
     if force or expose_ssh is None:
@@ -395,7 +648,7 @@ def main() -> int:
         expose_ssh = prompt_yes_no(usl(
             f"""Do you want to expose SSH via cloudflared SSH tunnel at ssh.{zone_name}?
             ("cloudflared" must be installed on the client, and SSH keys will still be required to connect)"""), default=default_expose_ssh)
-        params["expose_ssh"] = expose_ssh
+        set_param("expose_ssh", expose_ssh)
         flush_params()
 
     expose_traefik = params.get("expose_traefik")
@@ -404,7 +657,7 @@ def main() -> int:
         expose_traefik = prompt_yes_no(usl(
             f"""Do you want to expose the Traefik dashboard on the public Internet at https://traefik.{zone_name}?
             (It will be somewhat protected with HTTP basic authentication)"""), default=default_expose_traefik)
-        params["expose_traefik"] = expose_traefik
+        set_param("expose_traefik", expose_traefik)
         flush_params()
 
     expose_portainer = params.get("expose_portainer")
@@ -413,14 +666,15 @@ def main() -> int:
         expose_portainer = prompt_yes_no(usl(
             f"""Do you want to expose the Portainer web UI on the public Internet at https://portainer.{zone_name}?
             (It will be somewhat protected with Portainer's integrated username/password authentication)"""), default=default_expose_portainer)
-        params["expose_portainer"] = expose_portainer
+        set_param("expose_portainer", expose_portainer)
         flush_params()
 
     etc_config_yml = os.path.join(etc_cloudflared_dir, "config.yml")
     if os.path.exists(etc_config_yml):
+        from tp_hub.yaml_template import yaml_safe_loader
         with open(etc_config_yml, "r", encoding='utf-8') as f:
             old_config_yml_content = f.read()
-        old_config: JsonableDict = yaml.safe_load(old_config_yml_content)
+        old_config: JsonableDict = yaml.load(old_config_yml_content, Loader=yaml_safe_loader)
         assert isinstance(old_config, dict)
         old_config_json_content = json.dumps(old_config, indent=2, sort_keys=True)
     else:
@@ -481,15 +735,13 @@ def main() -> int:
     if config_json_content != old_config_json_content:
         print(f"Updating {etc_config_yml}", file=sys.stderr)
         tmp_config_yml = os.path.join(home_cloudflared_dir, "config.yml.tmp")
-        if os.path.exists(tmp_config_yml):
-            os.unlink(tmp_config_yml)
+        _rm_f(tmp_config_yml)
         try:
             with open(os.open(tmp_config_yml, os.O_CREAT | os.O_WRONLY, 0o600), "w", encoding='utf-8') as f:
-                f.write(yaml.dump(config))
+                f.write(yaml.dump(config, Dumper=get_yaml_safe_dumper()))
             sudo_check_call_stderr_exception(["rsync", "-rlptD", "--chmod=F644", tmp_config_yml, etc_config_yml], use_sudo=True)
         finally:
-            if os.path.exists(tmp_config_yml):
-                os.unlink(tmp_config_yml)
+            _rm_f(tmp_config_yml)
         print(f"Successfully updated {etc_config_yml}", file=sys.stderr)
 
     if force or not os.path.exists('/etc/systemd/system/cloudflared.service') or not os.path.exists('/etc/systemd/system/cloudflared-update.service'):
@@ -504,38 +756,62 @@ def main() -> int:
         print("cloudflared systemd service already installed; restarting", file=sys.stderr)
         sudo_check_call_stderr_exception(["systemctl", "restart", "cloudflared"], use_sudo=True)
 
-    print("Waiting for tunnel to stabilize...", file=sys.stderr)
-    time.sleep(7.0)
-
     print("Testing tunnel...", file=sys.stderr)
     test_url = f"https://tunnel-test.{zone_name}"
-    response = urllib3.PoolManager().request('GET', test_url)
+    http = get_tunnel_test_http()
+    response: Optional[urllib3.HTTPResponse] = None
+    # Poll until the tunnel responds, rather than sleeping for a fixed time while it stabilizes. The
+    # poll interval starts short, since the tunnel is often ready almost immediately, and backs off.
+    deadline = time.monotonic() + tunnel_test_timeout_seconds
+    poll_interval = 0.1
+    while True:
+        try:
+            response = http.request('GET', test_url)
+            if response.status == 200 and tunnel_test_content in response.data:
+                break
+        except urllib3.exceptions.HTTPError as e:
+            logger.debug(f"Tunnel test request to {test_url} failed: {e}")
+            response = None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 2, 2.0)
+    if response is None:
+        print(f"ERROR: Unable to connect when testing tunnel at {test_url}", file=sys.stderr)
+        return 1
     if response.status != 200:
         print(f"ERROR: Got HTTP status {response.status} when testing tunnel at {test_url}", file=sys.stderr)
         return 1
-    response_content = response.data.decode('utf-8')
-    if not "Congrats! You created a tunnel!" in response_content:
+    if tunnel_test_content not in response.data:
         print(f"ERROR: Got unexpected response content when testing tunnel at {test_url}", file=sys.stderr)
         return 1
     print(f"Successfully tested tunnel at {test_url}", file=sys.stderr)
 
 
-    print("\n============================================================", file=sys.stderr)
-    print(f"Cloudflare username: {email}", file=sys.stderr)
-    print("Cloudflare API key: <verified>", file=sys.stderr)
-    print(f"Cloudflare zone: '{zone_name}', ID='{zone_id}'", file=sys.stderr)
-    print(f"Cloudflare tunnel: '{tunnel_name}', ID='{tunnel_id}'", file=sys.stderr)
-    print(f"Cloudflare tunnel test URL: https://tunnel-test.{zone_name}", file=sys.stderr)
+    lines: List[str] = [
+        "\n============================================================",
+        f"Cloudflare username: {email}",
+        "Cloudflare API key: <verified>",
+        f"Cloudflare zone: '{zone_name}', ID='{zone_id}'",
+        f"Cloudflare tunnel: '{tunnel_name}', ID='{tunnel_id}'",
+        f"Cloudflare tunnel test URL: https://tunnel-test.{zone_name}",
+      ]
     if expose_traefik:
-        print(f"Traefik dashboard URL: https://traefik.{zone_name}", file=sys.stderr)
+        lines.append(f"Traefik dashboard URL: https://traefik.{zone_name}")
     if expose_portainer:
-        print(f"Portainer web UI: https://portainer.{zone_name}", file=sys.stderr)
+        lines.append(f"Portainer web UI: https://portainer.{zone_name}")
     if expose_ssh:
-        print("SSH tunnel client config (install `cloudflared` and add these lines to ~/.ssh/config on client machine):", file=sys.stderr)
-        print(f"    Host ssh.{zone_name}", file=sys.stderr)
-        print("            ProxyCommand /usr/local/bin/cloudflared access ssh --hostname %h", file=sys.stderr)
-    print("============================================================", file=sys.stderr)
-    print("Cloudflare configuration complete", file=sys.stderr)
+        lines.extend([
+            "SSH tunnel client config (install `cloudflared` and add these lines to ~/.ssh/config on client machine):",
+            f"    Host ssh.{zone_name}",
+            "            ProxyCommand /usr/local/bin/cloudflared access ssh --hostname %h",
+          ])
+    lines.extend([
+        "============================================================",
+        "Cloudflare configuration complete",
+      ])
+    emit(*lines)
 
     return 0
 
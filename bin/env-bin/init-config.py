@@ -19,13 +19,16 @@ import argparse
 import json
 import logging
 import getpass
+import secrets
+from functools import lru_cache, partial
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from tp_hub import (
     Jsonable, JsonableDict, JsonableList,
     get_project_dir,
     logger,
     get_config_yml,
-    set_config_yml_property,
+    set_config_yml_properties,
     unindent_string_literal as usl,
     hash_username_password,
     hash_password,
@@ -47,45 +50,51 @@ def prompt_value(prompt: str, default: Optional[str]=None) -> str:
     else:
         prompt = f"{prompt} [{default}]: "
 
-    print("", file=sys.stderr)
+    # The leading blank line and the prompt are written together, in a single write
+    sys.stderr.write(f"\n{prompt}")
+    sys.stderr.flush()
     while True:
-        value = input(prompt)
-        if value == "":
-            if default is None:
-                print("A value is required; please try again")
-            else:
-                value = default
-        return value
+        value = input()
+        if value != "":
+            return value
+        if default is not None:
+            return default
+        sys.stderr.write(f"A value is required; please try again\n{prompt}")
+        sys.stderr.flush()
     
-def prompt_verify_password(prompt: str) -> str:
+def prompt_verify_password(prompt: str, hasher: Optional[Callable[[str], str]]=None) -> str:
     prompt = prompt.strip()
-    print("", file=sys.stderr)
-    while True:
-        password = getpass.getpass(prompt=f"{prompt}: ")
-        password2 = getpass.getpass(prompt="Please enter again to confirm: ")
-        if password != password2:
-            print("Passwords do not match; please try again", file=sys.stderr)
-        else:
-            return password
+    # If a hasher is provided, the result is hasher(password). The (slow) hash is computed in
+    # the background while the user is retyping the password to confirm it.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        while True:
+            password = getpass.getpass(prompt=f"\n{prompt}: ")
+            hashed_future: Optional[Future[str]] = None if hasher is None else executor.submit(hasher, password)
+            password2 = getpass.getpass(prompt="Please enter again to confirm: ")
+            if password != password2:
+                print("Passwords do not match; please try again", file=sys.stderr)
+            else:
+                return password if hashed_future is None else hashed_future.result()
+
+_yes_answers = frozenset([ "y", "yes", "true", "t", "1" ])
+_no_answers = frozenset([ "n", "no", "false", "f", "0" ])
 
 def prompt_yes_no(prompt: str, default: Optional[bool]=None) -> bool:
     while True:
         answer = prompt_value(prompt, default=None if default is None else ("Y" if default else "N")).lower()
-        if answer in [ "y", "yes", "true", "t", "1" ]:
+        if answer in _yes_answers:
             return True
-        elif answer in [ "n", "no", "false", "f", "0" ]:
+        elif answer in _no_answers:
             return False
         print("Please answer 'y' or 'n'", file=sys.stderr)
 
+@lru_cache(maxsize=512)
 def expand_dns_name(name: str, parent_dns_domain: str) -> str:
-    if '.' in name:
-        return name
-    return f"{name}.{parent_dns_domain}"
+    return name if '.' in name else name + "." + parent_dns_domain
 
+@lru_cache(maxsize=512)
 def shrink_dns_name(name: str, parent_dns_domain: str) -> str:
-    if name.endswith(f".{parent_dns_domain}"):
-        return name[:-len(f".{parent_dns_domain}")]
-    return name
+    return name.removesuffix("." + parent_dns_domain)
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Install prerequisites for this project")
@@ -104,11 +113,19 @@ def main() -> int:
 
     data = config_yml.get("hub", {})
 
+    # Changed properties are applied to the in-memory hub settings, so later reads see them, and
+    # are collected and written to config.yml in a single update at the end
+    updated_properties: Dict[str, Jsonable] = {}
+
+    def set_hub_property(name: str, value: Jsonable) -> None:
+        data[name] = value
+        updated_properties[f"hub.{name}"] = value
+
     portainer_agent_secret = data.get("portainer_agent_secret")
     if force or portainer_agent_secret is None or len(portainer_agent_secret) < 16:
         print("Generating new portainer_agent_secret...", file=sys.stderr)
-        portainer_agent_secret = os.urandom(32).hex()
-        set_config_yml_property("hub.portainer_agent_secret", portainer_agent_secret)
+        portainer_agent_secret = secrets.token_hex(16)
+        set_hub_property("portainer_agent_secret", portainer_agent_secret)
 
     traefik_password_hash = data.get("traefik_dashboard_htpasswd")
     if force or traefik_password_hash is None:
@@ -117,16 +134,15 @@ def main() -> int:
                    Reset traefik dashboard password?
                 """), default=False)
         if need_reset:
-            new_password = prompt_verify_password(usl(
+            hashed = prompt_verify_password(usl(
                 """The Traefik reverse-proxy provides a dashboard Web UI. It
                    will only be exposed on the local LAN, and it will be protected
                    with basic HTTP authenthication using a bcrypt password hash. This
                    is a good, time-consuming hash but a strong password should be selected
                    to defend against dictionary attacks on the hash.
                    Enter a new Traefik dashboard password for user 'admin'"""
-              ))
-            hashed = hash_username_password('admin', new_password)
-            set_config_yml_property(f"hub.traefik_dashboard_htpasswd", hashed)
+              ), hasher=partial(hash_username_password, 'admin'))
+            set_hub_property("traefik_dashboard_htpasswd", hashed)
             print("Traefik dashboard password reset successfully!", file=sys.stderr)
 
     portainer_password_hash = data.get("portainer_initial_password_hash")
@@ -136,7 +152,7 @@ def main() -> int:
                    Reset Portainer initial password?
                 """), default=False)
         if need_reset:
-            new_password = prompt_verify_password(usl(
+            hashed = prompt_verify_password(usl(
                 """Portainer provides a rich web UI. It will only be exposed on the local LAN.
                    Nonetheless, Portainer is protected by its own username/hashed-password
                    database. The first time the Portainer web UI is used, the only login account
@@ -151,9 +167,8 @@ def main() -> int:
                    unless you wipe Portainer state by recreating the 'portainer_data' volume.
 
                    Enter a Portainer initial password for user 'admin'"""
-              ))
-            hashed = hash_password(new_password)
-            set_config_yml_property(f"hub.portainer_initial_password_hash", hashed)
+              ), hasher=hash_password)
+            set_hub_property("portainer_initial_password_hash", hashed)
             print("Poratiner initial admin password reset successfully!", file=sys.stderr)
 
     parent_dns_domain = data.get("parent_dns_domain")
@@ -176,14 +191,18 @@ def main() -> int:
                 print("Invalid domain name; please try again", file=sys.stderr)
                 continue
             break
-        set_config_yml_property("hub.parent_dns_domain", parent_dns_domain)
+        set_hub_property("parent_dns_domain", parent_dns_domain)
 
-    rewrite_roundtrip_config_yml()
+    if len(updated_properties) > 0:
+        set_config_yml_properties(updated_properties)
+    else:
+        rewrite_roundtrip_config_yml()
 
-    traefik_dns_name = expand_dns_name(data.get("traefik_dashboard_dns_name") or 'traefik', parent_dns_domain)
-    portainer_dns_name = expand_dns_name(data.get("portainer_dns_name") or 'portainer', parent_dns_domain)
-    shared_app_dns_name = expand_dns_name(data.get("shared_app_dns_name") or 'hub', parent_dns_domain)
-    whoami_dns_name = f"whoami.{parent_dns_domain}"
+    expand = partial(expand_dns_name, parent_dns_domain=parent_dns_domain)
+    traefik_dns_name = expand(data.get("traefik_dashboard_dns_name") or 'traefik')
+    portainer_dns_name = expand(data.get("portainer_dns_name") or 'portainer')
+    shared_app_dns_name = expand(data.get("shared_app_dns_name") or 'hub')
+    whoami_dns_name = expand('whoami')
 
 
 
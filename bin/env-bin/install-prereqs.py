@@ -18,6 +18,7 @@ import dotenv
 import argparse
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from typing import Dict, List
 
@@ -30,9 +31,11 @@ from tp_hub import (
     install_aws_cli,
     aws_cli_is_installed,
     create_docker_network,
-    create_docker_volume,
+    create_docker_volumes,
+    prefetch_docker_state,
     should_run_with_group,
     get_public_ipv4_egress_address,
+    get_internet_ipv4_route_info,
     get_gateway_lan_ip4_address,
     get_lan_ipv4_address,
     get_default_ipv4_interface,
@@ -107,14 +110,14 @@ def main() -> int:
     # Install cloudflared
     install_cloudflared(force=force)
 
+    # Fetch the existing docker networks and volumes in one concurrent batch
+    prefetch_docker_state()
+
     # Create the "traefik" network if it doesn't exist:
     create_docker_network("traefik")
 
-    # Create The "traefik_acme" volume if it doesn't exist:
-    create_docker_volume("traefik_acme")
-
-    # Create the "portainer_data" volume if it doesn't exist:
-    create_docker_volume("portainer_data")
+    # Create the "traefik_acme" and "portainer_data" volumes if they don't exist:
+    create_docker_volumes(["traefik_acme", "portainer_data"])
 
     project_dir = get_project_dir()
     config_yml_file = os.path.join(project_dir, "config.yml")
@@ -124,7 +127,14 @@ def main() -> int:
         with open(config_yml_file, 'w', encoding='utf-8') as fd:
             fd.write(config_yml_content)
 
-    public_ip_addr = get_public_ipv4_egress_address()
+    # The public IP lookup (an HTTP request) and the default route lookup (an "ip route" subprocess)
+    # are independent, so run them concurrently. The LAN address, gateway address, and default interface
+    # are all derived from the cached default route info.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        public_ip_addr_future = executor.submit(get_public_ipv4_egress_address, force_refresh=force)
+        route_info_future = executor.submit(get_internet_ipv4_route_info)
+        public_ip_addr = public_ip_addr_future.result()
+        route_info_future.result()
     gateway_lan_ip_addr = get_gateway_lan_ip4_address()
     lan_ip_addr = get_lan_ipv4_address()
     default_interface = get_default_ipv4_interface()
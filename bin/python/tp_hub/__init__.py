@@ -4,6 +4,8 @@
 Handy Python utilities for this project
 """
 
+import importlib
+
 from .version import __version__
 
 from .internal_types import *
@@ -26,6 +28,7 @@ from .config import (
     save_roundtrip_config_yml,
     get_config_yml_property,
     set_config_yml_property,
+    set_config_yml_properties,
   )
 
 from .proj_dirs import (
@@ -64,11 +67,16 @@ from .util import (
     docker_call_output,
     docker_compose_call,
     docker_compose_call_output,
+    docker_compose_call_many,
     loads_ndjson,
+    copy_jsonable,
     get_docker_networks,
     get_docker_volumes,
+    prefetch_docker_state,
     create_docker_network,
+    create_docker_networks,
     create_docker_volume,
+    create_docker_volumes,
     docker_is_installed,
     install_docker,
     docker_compose_is_installed,
@@ -80,8 +88,12 @@ from .util import (
     sudo_check_call_stderr_exception,
     sudo_check_output_stderr_exception,
     download_url_text,
+    get_http_pool,
     resolve_public_dns,
+    resolve_public_dns_many,
     raw_resolve_public_dns,
+    buffer_stderr,
+    emit,
     unindent_text,
     unindent_string_literal,
     is_valid_ipv4_address,
@@ -90,40 +102,99 @@ from .util import (
     is_valid_email_address,
     rel_symlink,
     atomic_mv,
+    get_user_cache_dir,
   )
 
-from .docker_util import (
-    read_docker_volume_text_file,
-    write_docker_volume_text_file,
-    list_files_in_docker_volume,
-    remove_docker_volume_file,
-    docker_volume_exists,
-    verify_docker_volume_exists,
-  )
+# The remaining exports are imported lazily on first access (PEP 562), so that
+# scripts that only need the utilities above do not pay for importing bcrypt, the
+# docker and ACME helpers, or the builders at startup. Note that the config
+# exports above still import pydantic_settings (and with it dotenv), yaml and
+# ruamel.yaml eagerly.
+_lazy_exports: Dict[str, str] = {
+    "read_docker_volume_text_file": ".docker_util",
+    "write_docker_volume_text_file": ".docker_util",
+    "list_files_in_docker_volume": ".docker_util",
+    "remove_docker_volume_file": ".docker_util",
+    "docker_volume_exists": ".docker_util",
+    "verify_docker_volume_exists": ".docker_util",
+    "list_traefik_acme_files": ".acme_util",
+    "load_traefik_acme_data": ".acme_util",
+    "save_traefik_acme_data": ".acme_util",
+    "get_acme_domain_data": ".acme_util",
+    "hash_password": ".password_hash",
+    "check_password": ".password_hash",
+    "hash_username_password": ".password_hash",
+    "check_username_password": ".password_hash",
+    "DockerComposeStack": ".docker_compose_stack",
+    "call_docker_compose_stacks": ".docker_compose_stack",
+    "up_docker_compose_stacks": ".docker_compose_stack",
+    "down_docker_compose_stacks": ".docker_compose_stack",
+    "x_dotenv_loads": ".x_dotenv",
+    "x_dotenv_load_file": ".x_dotenv",
+    "x_dotenv_dumps": ".x_dotenv",
+    "x_dotenv_save_file": ".x_dotenv",
+    "x_dotenv_update_file": ".x_dotenv",
+    "build_traefik": ".builder",
+    "build_portainer": ".builder",
+    "build_hub": ".builder",
+    "load_yaml_template_str": ".yaml_template",
+    "load_yaml_template_file": ".yaml_template",
+    "yaml_safe_loader": ".yaml_template",
+    "load_yaml_file_cached": ".yaml_cache",
+  }
+"""Map of lazily imported export names to the relative name of the module that defines them"""
 
-from .acme_util import (
-    list_traefik_acme_files,
-    load_traefik_acme_data,
-    save_traefik_acme_data,
-    get_acme_domain_data
-  )
+def __getattr__(name: str) -> Any:
+    module_name = _lazy_exports.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache in the package namespace so __getattr__ is not called again for this name
+    globals()[name] = value
+    return value
 
-from .password_hash import hash_password, check_password, hash_username_password, check_username_password
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_lazy_exports))
 
-from .docker_compose_stack import DockerComposeStack
+if TYPE_CHECKING:
+    from .docker_util import (
+        read_docker_volume_text_file,
+        write_docker_volume_text_file,
+        list_files_in_docker_volume,
+        remove_docker_volume_file,
+        docker_volume_exists,
+        verify_docker_volume_exists,
+      )
 
-from .x_dotenv import (
-    x_dotenv_loads,
-    x_dotenv_load_file,
-    x_dotenv_dumps,
-    x_dotenv_save_file,
-    x_dotenv_update_file,  
-)
+    from .acme_util import (
+        list_traefik_acme_files,
+        load_traefik_acme_data,
+        save_traefik_acme_data,
+        get_acme_domain_data
+      )
 
-from .builder import (
-    build_traefik,
-    build_portainer,
-    build_hub,
-  )
+    from .password_hash import hash_password, check_password, hash_username_password, check_username_password
+
+    from .docker_compose_stack import (
+        DockerComposeStack,
+        call_docker_compose_stacks,
+        up_docker_compose_stacks,
+        down_docker_compose_stacks,
+      )
+
+    from .x_dotenv import (
+        x_dotenv_loads,
+        x_dotenv_load_file,
+        x_dotenv_dumps,
+        x_dotenv_save_file,
+        x_dotenv_update_file,  
+    )
+
+    from .builder import (
+        build_traefik,
+        build_portainer,
+        build_hub,
+      )
 
-from .yaml_template import load_yaml_template_str, load_yaml_template_file
+    from .yaml_template import load_yaml_template_str, load_yaml_template_file, yaml_safe_loader
+    from .yaml_cache import load_yaml_file_cached
@@ -17,8 +17,10 @@ import argparse
 import json
 import logging
 import getpass
+import secrets
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from tp_hub.internal_types import *
 
@@ -33,9 +35,11 @@ from tp_hub import (
     install_aws_cli,
     aws_cli_is_installed,
     create_docker_network,
-    create_docker_volume,
+    create_docker_volumes,
+    prefetch_docker_state,
     should_run_with_group,
     get_public_ipv4_egress_address,
+    get_internet_ipv4_route_info,
     get_gateway_lan_ip4_address,
     get_lan_ipv4_address,
     get_default_ipv4_interface,
@@ -60,6 +64,14 @@ from tp_hub.route53_dns_name import create_route53_dns_name, get_aws, AwsContext
 
 PROGNAME = "hub"
 
+_config_scalar_property_converters: Dict[str, Callable[[str], Jsonable]] = {
+    'string': str,
+    'integer': int,
+    'number': float,
+    'boolean': bool,
+  }
+"""Converters from a command-line string to a config property value, keyed by JSON schema type"""
+
 class CmdExitError(RuntimeError):
     exit_code: int
 
@@ -87,6 +99,7 @@ class CommandHandler:
     _aws: Optional[AwsContext] = None
     _hub_settings_params: Dict[str, Any]
     _hub_settings: Optional[HubSettings] = None
+    _settings_schema: Optional[JsonableDict] = None
 
     def __init__(self, argv: Optional[Sequence[str]]=None):
         self._argv = argv
@@ -99,7 +112,9 @@ class CommandHandler:
         return self._hub_settings
     
     def get_settings_schema(self) -> JsonableDict:
-        return HubSettings.model_json_schema()
+        if self._settings_schema is None:
+            self._settings_schema = HubSettings.model_json_schema()
+        return self._settings_schema
 
     def get_project_dir(self) -> str:
         if self._project_dir is None:
@@ -209,9 +224,11 @@ class CommandHandler:
 
     def cmd_portainer_reset_admin_password(self) -> int:
         format_as_json = self._args.json
-        is_up = self.portainer_has_running_conainers()
+        # A single stack object is used throughout, so the compose options are only processed once
+        portainer_stack = self.get_portainer_stack()
+        is_up = portainer_stack.has_running_containers()
         if is_up:
-            self.portainer_down()
+            portainer_stack.down()
 
         docker_call_output(["pull", "portainer/helper-reset-password"])
 
@@ -241,7 +258,7 @@ class CommandHandler:
             raise HubError("Failed to reset Portainer admin password")
         
         if is_up:
-            self.portainer_up()
+            portainer_stack.up()
 
         if format_as_json:
             print(json.dumps(password))
@@ -298,7 +315,7 @@ class CommandHandler:
         property_name_parts = [] if property_name is None else property_name.split('.')
         data = json.loads(self.get_settings().model_dump_json())
         for name in property_name_parts:
-            if not name in data:
+            if name not in data:
                 raise CmdExitError(1, f"Property name {property_name} does not exist")
             data = data[name]
 
@@ -329,9 +346,9 @@ class CommandHandler:
 
     def cmd_config_check_traefik_password(self) -> int:
         hashed = get_config_yml_property(f"hub.traefik_dashboard_htpasswd")
-        if not ':' in hashed:
+        cfg_username, sep, _ = hashed.partition(':')
+        if not sep:
             raise HubError(1, "Configured password hash is malformed")
-        cfg_username, _ = hashed.split(':', 1)
         username = self._args.username
         username_given = username is not None
         if not username_given:
@@ -385,7 +402,7 @@ class CommandHandler:
     def cmd_config_set_portainer_secret(self) -> int:
         secret = self._args.secret
         if secret is None:
-            secret = os.urandom(32).hex()
+            secret = secrets.token_hex(16)
         set_config_yml_property(f"hub.portainer_agent_secret", secret)
         return 0
 
@@ -428,14 +445,9 @@ class CommandHandler:
             if len(allowed_types) > 1:
                 raise ValueError(f"Property name {property_name} has multiple allowed types: {allowed_types}; cannot be set")
             allowed_type = allowed_types.pop()
-            if allowed_type == 'string':
-                property_converter = str
-            elif allowed_type == 'integer':
-                property_converter = int
-            elif allowed_type == 'number':
-                property_converter = float
-            elif allowed_type == 'boolean':
-                property_converter = bool
+            scalar_converter = _config_scalar_property_converters.get(allowed_type)
+            if scalar_converter is not None:
+                property_converter = scalar_converter
             elif allowed_type == 'array' and 'items' in property and 'type' in property['items'] and property['items']['type'] == 'string':
                 property_converter = lambda x: x.split(',')
             else:
@@ -485,16 +497,23 @@ class CommandHandler:
         if not aws_cli_is_installed() or force:
             install_aws_cli(force=force)
 
+        # Fetch the existing docker networks and volumes in one concurrent batch
+        prefetch_docker_state()
+
         # Create the "traefik" network if it doesn't exist:
         create_docker_network("traefik")
 
-        # Create The "traefik_acme" volume if it doesn't exist:
-        create_docker_volume("traefik_acme")
-
-        # Create the "portainer_data" volume if it doesn't exist:
-        create_docker_volume("portainer_data")
-
-        public_ip_addr = get_public_ipv4_egress_address()
+        # Create the "traefik_acme" and "portainer_data" volumes if they don't exist:
+        create_docker_volumes(["traefik_acme", "portainer_data"])
+
+        # The public IP lookup (an HTTP request) and the default route lookup (an "ip route" subprocess)
+        # are independent, so run them concurrently. The LAN address, gateway address, and default interface
+        # are all derived from the cached default route info.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            public_ip_addr_future = executor.submit(get_public_ipv4_egress_address, force_refresh=force)
+            route_info_future = executor.submit(get_internet_ipv4_route_info)
+            public_ip_addr = public_ip_addr_future.result()
+            route_info_future.result()
         gateway_lan_ip_addr = get_gateway_lan_ip4_address()
         lan_ip_addr = get_lan_ipv4_address()
         default_interface = get_default_ipv4_interface()
@@ -11,20 +11,20 @@ Builder tools
 import os
 import json
 import hashlib
-from datetime import datetime
-from functools import cache
+from datetime import datetime, timezone
+from threading import Lock
 
 from ..internal_types import *
 from ..pkg_logging import logger
 from ..config import HubSettings, current_hub_settings
 
-very_old = datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+very_old = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
-def timestamp_now() -> datetime.datetime:
+def timestamp_now() -> datetime:
     return datetime.utcnow()
 
 def timestamp_to_str(ts: datetime) -> str:
-    ts = ts.astimezone(datetime.timezone.utc)
+    ts = ts.astimezone(timezone.utc)
     result = ts.isoformat()
     if result.endswith("+00:00"):
         result = result[:-6] + "Z"
@@ -33,17 +33,29 @@ def timestamp_to_str(ts: datetime) -> str:
 def str_to_timestamp(s: str) -> datetime:
     if s.endswith("Z"):
         s = s[:-1] + "+00:00"
-    return datetime.fromisoformat(s).astimezone(datetime.timezone.utc)
+    return datetime.fromisoformat(s).astimezone(timezone.utc)
+
+_last_config_hash: Optional[Tuple[HubSettings, str]] = None
+_last_config_hash_lock = Lock()
 
-@cache
 def get_config_hash(settings: Optional[HubSettings]=None) -> str:
     """
     Returns a hash of the current configuration settings. Will
     be used to determine if a rebuild is necessary.
+
+    The hash of the most recently hashed settings instance is remembered, so repeated
+    calls for the same (e.g., current) settings do not serialize them again.
     """
+    global _last_config_hash
     if settings is None:
         settings = current_hub_settings()
-    settings_data = json.loads(settings.model_dump_json())
+    with _last_config_hash_lock:
+        last = _last_config_hash
+    if last is not None and last[0] is settings:
+        return last[1]
+    settings_data = settings.model_dump(mode='json')
     settings_str = json.dumps(settings_data, separators=(',', ':'), sort_keys=True)
     settings_hash = hashlib.sha256(settings_str.encode('utf-8')).hexdigest()
+    with _last_config_hash_lock:
+        _last_config_hash = (settings, settings_hash)
     return settings_hash
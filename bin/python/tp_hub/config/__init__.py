@@ -28,4 +28,5 @@ from .config_yml import (
     save_roundtrip_config_yml,
     get_config_yml_property,
     set_config_yml_property,
+    set_config_yml_properties,
   )
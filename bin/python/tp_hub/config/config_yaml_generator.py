@@ -27,11 +27,18 @@ _explicit_default_properties: Set[str] = set([
 
 @cache
 def _get_settings_schema() -> JsonableDict:
+    # Generating the schema is expensive; the result is shared and must not be modified
     return HubSettings.model_json_schema()
 
+@cache
+def get_setting_names() -> Tuple[str, ...]:
+    """Get the setting names, in schema order"""
+    properties: Dict[str, JsonableDict] = _get_settings_schema()["properties"]
+    return tuple(properties.keys())
+
 def get_setting_comment(name: str) -> str:
     """Use HubSettings schema to generate default settings.yml content, with comments"""
-    schema = HubSettings.model_json_schema()
+    schema = _get_settings_schema()
     lns: List[str] = []
     properties: Dict[str, JsonableDict] = schema["properties"]
     property = properties[name]
@@ -51,14 +58,11 @@ def get_setting_comment(name: str) -> str:
 
 def iter_setting_names() -> Generator[str, None, None]:
     """Iterate over setting names"""
-    schema = HubSettings.model_json_schema()
-    properties: Dict[str, JsonableDict] = schema["properties"]
-    for name in properties.keys():
-        yield name
+    yield from get_setting_names()
 
 def generate_settings_yaml() -> str:
     """Use HubSettings schema to generate default settings.yml content, with comments"""
-    schema = HubSettings.model_json_schema()
+    schema = _get_settings_schema()
     lns: List[str] = []
     lns.extend(usl(
         f"""version: 1.2
@@ -10,33 +10,82 @@ Read and write config.yml
 
 import os
 from ruamel.yaml import YAML
-from ruamel.yaml.comments import CommentedMap as YAMLContainer
+from ruamel.yaml.comments import CommentedMap as YAMLContainer, CommentedSeq, Comment
 import yaml
 from copy import deepcopy
-from threading import Lock
+from threading import Lock, local
 from io import StringIO
 from functools import cache
 from .impl import HubSettings
 from .config_yaml_generator import generate_settings_yaml
-from ..util import unindent_string_literal as usl, unindent_text, atomic_mv
+from ..util import unindent_string_literal as usl, unindent_text, atomic_mv, copy_jsonable
 from ..pkg_logging import logger
 
 from ..internal_types import *
 from ..version import __version__ as pkg_version
 from ..proj_dirs import get_project_dir
+from ..yaml_cache import load_yaml_file_cached
+from ..yaml_template import yaml_safe_loader
 
 _config_yml: Optional[JsonableDict] = None
 _roundtrip_config_yml: Optional[YAMLContainer] = None
 _cache_lock = Lock()
 
+_ryaml_local = local()
+"""Per-thread state; holds the reusable round-trip YAML instance, which is not thread-safe"""
+
+def _get_ryaml() -> YAML:
+    """
+    Get this thread's round-trip YAML instance, creating it on first use. Constructing a YAML
+    instance registers all of its resolvers, constructors and representers, so one is reused
+    for every load and dump rather than built per call.
+    """
+    ryaml: Optional[YAML] = getattr(_ryaml_local, 'ryaml', None)
+    if ryaml is None:
+        ryaml = YAML()
+        ryaml.representer.add_representer(type(None), _null_representer)
+        _ryaml_local.ryaml = ryaml
+    return ryaml
 
 @cache
 def _get_default_roundtrip_config_yml() -> YAMLContainer:
     content = generate_settings_yaml()
-    data = YAML().load(content)
+    data = _get_ryaml().load(content)
     assert isinstance(data, YAMLContainer)
     return data
 
+@cache
+def _get_default_config_yml() -> JsonableDict:
+    # Shared; must not be modified
+    data = yaml.load(generate_settings_yaml(), Loader=yaml_safe_loader)
+    assert isinstance(data, dict)
+    return data
+
+def _copy_roundtrip_yml(value: Any) -> Any:
+    """
+    Return a copy of a round-trip YAML tree that can be modified without affecting the original.
+
+    Unlike copy.deepcopy, only the containers and their comment metadata are copied; the
+    scalar leaves (immutable, possibly ruamel ScalarString etc.) are shared, and there is no
+    memo bookkeeping for every node. Anchored nodes that appear more than once in the tree
+    become independent copies.
+    """
+    result: Any
+    if isinstance(value, YAMLContainer):
+        result = YAMLContainer()
+        for k, v in value.items():
+            result[k] = _copy_roundtrip_yml(v)
+    elif isinstance(value, CommentedSeq):
+        result = CommentedSeq(_copy_roundtrip_yml(v) for v in value)
+    else:
+        return value
+    # Format, line/column, anchor and tag info are not modified in place, so they are shared
+    value.copy_attributes(result)
+    if hasattr(value, Comment.attrib):
+        # Comment info is modified when keys are deleted or inserted, so it gets its own copy
+        setattr(result, Comment.attrib, deepcopy(getattr(value, Comment.attrib)))
+    return result
+
 def _clear_config_yml_cache_no_lock() -> None:
     global _config_yml
     global _roundtrip_config_yml
@@ -54,37 +103,64 @@ def get_config_yml() -> JsonableDict:
     global _config_yml
     with _cache_lock:
         if _config_yml is None:
-            rt_data = _get_roundtrip_config_yml_no_lock()
-            rt_content = render_roundtrip(rt_data)
-            data = yaml.safe_load(rt_content)
+            # Built from plain safe parses of the default content and config.yml; the much
+            # slower comment-preserving round-trip parse is only done when config.yml is
+            # rewritten.
+            data = copy_jsonable(_get_default_config_yml())
+            hub_data = data['hub']
+            pathname = get_config_yml_pathname()
+            try:
+                new_data = load_yaml_file_cached(pathname)
+            except FileNotFoundError:
+                new_data = None
+            if new_data is not None:
+                if not isinstance(new_data, dict):
+                    raise HubError(f"get_config_yml: {pathname} must contain a dictionary")
+                new_hub_data = new_data.get('hub')
+                if new_hub_data is not None:
+                    for k, v in new_hub_data.items():
+                        if k not in hub_data:
+                            raise HubError(f"get_config_yml: Unknown setting in config.yml: '{k}'")
+                        hub_data[k] = v
             _config_yml = data
         result = _config_yml
 
-    return deepcopy(result)
+    return copy_jsonable(result)
 
-def _get_roundtrip_config_yml_no_lock() -> YAMLContainer:
+def _get_shared_roundtrip_config_yml_no_lock() -> YAMLContainer:
+    """
+    Get the cached round-trip config.yml tree itself, loading it if necessary. The caller
+    must hold _cache_lock, and must clear the cache if it modifies the tree without
+    writing it to config.yml.
+    """
     global _roundtrip_config_yml
     pathname = get_config_yml_pathname()
     if _roundtrip_config_yml is None:
-        data = deepcopy(_get_default_roundtrip_config_yml())
+        data = _copy_roundtrip_yml(_get_default_roundtrip_config_yml())
         hub_data = data['hub']
         assert isinstance(data, YAMLContainer)
-        if os.path.exists(pathname):
-            with open(get_config_yml_pathname(), 'r', encoding="utf-8") as fd:
+        content: Optional[str]
+        try:
+            with open(pathname, 'r', encoding="utf-8") as fd:
                 content = fd.read()
-            new_data: YAMLContainer = YAML().load(content)
+        except FileNotFoundError:
+            content = None
+        if content is not None:
+            new_data: YAMLContainer = _get_ryaml().load(content)
             assert isinstance(new_data, YAMLContainer)
             new_hub_data = new_data.get('hub')
             if not new_hub_data is None:
                 for k, v in new_hub_data.items():
-                    if not k in hub_data:
+                    if k not in hub_data:
                         raise HubError(f"get_roudtrip_config_yml: Unknown setting in config.yml: '{k}'")
                     hub_data[k] = v
         else:
             logger.debug("get_roundtrip_config_yml: Generating default config.yml")
         _roundtrip_config_yml = data
-    result = _roundtrip_config_yml
-    return deepcopy(result)
+    return _roundtrip_config_yml
+
+def _get_roundtrip_config_yml_no_lock() -> YAMLContainer:
+    return _copy_roundtrip_yml(_get_shared_roundtrip_config_yml_no_lock())
 
 def get_roundtrip_config_yml() -> YAMLContainer:
     global _roundtrip_config_yml
@@ -127,9 +203,7 @@ def write_config_yml_content(content: str) -> None:
     
 
 def render_roundtrip(data: YAMLContainer) -> str:
-    ryaml = YAML()
-    ryaml.representer.add_representer(type(None), _null_representer)
-    content = _ryaml_dumps(ryaml, data)
+    content = _ryaml_dumps(_get_ryaml(), data)
     return content
 
 def save_roundtrip_config_yml(data: YAMLContainer) -> None:
@@ -147,15 +221,30 @@ def get_config_yml_property(name: str) -> Jsonable:
         data = data[name]
     return data[names[-1]]
 
+def set_config_yml_properties(values: Mapping[str, Jsonable]) -> None:
+    """
+    Set multiple properties in config.yml, each named by a dotted path (e.g., "hub.parent_dns_domain").
+    config.yml is read and written only once, regardless of the number of properties.
+    """
+    with _cache_lock:
+        # Modify the cached tree in place rather than a copy of it; writing config.yml
+        # clears the cache, and so does any failure before then.
+        root = _get_shared_roundtrip_config_yml_no_lock()
+        try:
+            for name, value in values.items():
+                names = name.split('.')
+                if names[0] not in root:
+                    raise HubError(f"set_config_yml_property: Unknown setting in config.yml: '{names[0]}'")
+                data = root
+                for name in names[:-1]:
+                    if name not in data or data[name] is None:
+                        data[name] = {}
+                    data = data[name]
+                data[names[-1]] = value
+            content = render_roundtrip(root)
+            _write_config_yml_content_no_lock(content)
+        finally:
+            _clear_config_yml_cache_no_lock()
+
 def set_config_yml_property(name: str, value: Jsonable) -> None:
-    names = name.split('.')
-    root = get_roundtrip_config_yml()
-    if names[0] not in root:
-        raise HubError(f"set_config_yml_property: Unknown setting in config.yml: '{names[0]}'")
-    data = root
-    for name in names[:-1]:
-        if name not in data or data[name] is None:
-            data[name] = {}
-        data = data[name]
-    data[names[-1]] = value
-    save_roundtrip_config_yml(root)
+    set_config_yml_properties({ name: value })
@@ -12,7 +12,7 @@ import sys
 import yaml
 import os
 from copy import deepcopy
-from functools import cache
+from functools import lru_cache
 from threading import Lock
 from socket import gethostname
 
@@ -139,7 +139,7 @@ class HubSettings(BaseSettings):
     @validator('parent_dns_domain', pre=True, always=True)
     def parent_dns_domain_validator(cls, v, values, **kwargs):
         sname = 'parent_dns_domain'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             raise HubConfigError(f"Setting {sname} is required; edit config.yml")
         if not is_valid_dns_name(v):
@@ -164,7 +164,7 @@ class HubSettings(BaseSettings):
     @validator('admin_parent_dns_domain', pre=True, always=True)
     def admin_parent_dns_domain_validator(cls, v, values, **kwargs):
         sname = 'admin_parent_dns_domain'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = values['parent_dns_domain']
         if not is_valid_dns_name(v):
@@ -179,7 +179,7 @@ class HubSettings(BaseSettings):
     @validator('traefik_version', pre=True, always=True)
     def traefik_version_validator(cls, v, values, **kwargs):
         sname = 'traefik_version'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = TRAEFIK_DEFAULT_VERSION
         return v
@@ -192,7 +192,7 @@ class HubSettings(BaseSettings):
     @validator('portainer_version', pre=True, always=True)
     def portainer_version_validator(cls, v, values, **kwargs):
         sname = 'portainer_version'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = PORTAINER_DEFAULT_VERSION
         return v
@@ -209,7 +209,7 @@ class HubSettings(BaseSettings):
     @validator('portainer_agent_secret', pre=True, always=True)
     def portainer_agent_secret_validator(cls, v, values, **kwargs):
         sname = 'portainer_agent_secret'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             raise HubConfigError(f"Setting {sname} is required; use 'hub config set-portainer-secret' to set it to a random value")
         if not isinstance(v, str) or len(v) < 16:
@@ -261,7 +261,7 @@ class HubSettings(BaseSettings):
     @validator('portainer_initial_password_hash', pre=True, always=True)
     def portainer_initial_password_hash_validator(cls, v, values, **kwargs):
         sname = 'portainer_initial_password_hash'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             raise HubConfigError(f"Setting {sname} is required; generate a password hash and set it with 'hub config set-portainer-initial-password'")
         if not isinstance(v, str):
@@ -310,13 +310,13 @@ class HubSettings(BaseSettings):
     @validator('traefik_dashboard_htpasswd', pre=True, always=True)
     def traefik_dashboard_htpasswd_validator(cls, v, values, **kwargs):
         sname = 'traefik_dashboard_htpasswd'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             raise HubConfigError(f"Setting {sname} is required; generate a username/password hash and set it with 'hub config set-traefik-password'")
         if not isinstance(v, str):
             raise HubConfigError(f"Setting '{sname}'={v!r} must be a string; generate a username/password hash and set it with 'hub config set-traefik-password'")
-        parts = v.split(':', 1)
-        if len(parts) != 2 or len(parts[0]) == 0 or len(parts[1]) < 20 or not parts[1].startswith('$2'):
+        username, sep, hashed_password = v.partition(':')
+        if not sep or len(username) == 0 or len(hashed_password) < 20 or not hashed_password.startswith('$2'):
             raise HubConfigError(f"Setting '{sname}'={v!r} must be a string of the form '<username>:<bcrypt-hashed-password>'; generate a username/password hash and set it with 'hub config set-traefik-password'")
         return v
 
@@ -330,7 +330,7 @@ class HubSettings(BaseSettings):
     @validator('traefik_dashboard_dns_name', pre=True, always=True)
     def traefik_dashboard_dns_name_validator(cls, v, values, **kwargs):
         sname = 'stable_traefik_dashboard_dns_name'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = 'traefik'
         if '.' not in v:
@@ -349,7 +349,7 @@ class HubSettings(BaseSettings):
     @validator('portainer_dns_name', pre=True, always=True)
     def portainer_dns_name_validator(cls, v, values, **kwargs):
         sname = 'portainer_dns_name'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = 'portainer'
         if '.' not in v:
@@ -372,7 +372,7 @@ class HubSettings(BaseSettings):
     @validator('shared_app_dns_name', pre=True, always=True)
     def shared_app_dns_name_validator(cls, v, values, **kwargs):
         sname = 'shared_app_dns_name'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = 'hub'
         if '.' not in v:
@@ -393,7 +393,7 @@ class HubSettings(BaseSettings):
     @validator('shared_app_default_path', pre=True, always=True)
     def shared_app_default_path_validator(cls, v, values, **kwargs):
         sname = 'shared_app_default_path'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = '/whoami'
         if not v.startswith('/'):
@@ -416,7 +416,7 @@ class HubSettings(BaseSettings):
     @validator('shared_lan_app_dns_name', pre=True, always=True)
     def shared_lan_app_dns_name_validator(cls, v, values, **kwargs):
         sname = 'shared_lan_app_dns_name'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = f"lan{values['shared_app_dns_name']}"
         if '.' not in v:
@@ -437,7 +437,7 @@ class HubSettings(BaseSettings):
     @validator('shared_lan_app_default_path', pre=True, always=True)
     def shared_lan_app_default_path_validator(cls, v, values, **kwargs):
         sname = 'shared_lan_app_default_path'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = values['shared_app_default_path']
         if not v.startswith('/'):
@@ -456,7 +456,7 @@ class HubSettings(BaseSettings):
     @validator('hub_lan_ipv4', pre=True, always=True)
     def hub_lan_ipv4_validator(cls, v, values, **kwargs):
         sname = 'hub_lan_ipv4'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None or v == '':
             v = str(get_lan_ipv4_address())
         else:
@@ -477,7 +477,7 @@ class HubSettings(BaseSettings):
     @validator('hub_hostname', pre=True, always=True)
     def hub_hostname_validator(cls, v, values, **kwargs):
         sname = 'hub_hostname'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None or v == '':
             v = gethostname()
         return v
@@ -496,7 +496,7 @@ class HubSettings(BaseSettings):
     @validator('hub_hostname2', pre=True, always=True)
     def hub_hostname2_validator(cls, v, values, **kwargs):
         sname = 'hub_hostname2'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None or v == '':
             v = f"{values['hub_hostname']}.local"
         return v
@@ -515,12 +515,12 @@ class HubSettings(BaseSettings):
     @validator('additional_shared_app_hostnames', pre=True, always=True)
     def additional_shared_app_hostnames_validator(cls, v, values, **kwargs):
         sname = 'additional_shared_app_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         v = sorted(list(set(v)))
         return v
@@ -544,12 +544,12 @@ class HubSettings(BaseSettings):
     @validator('shared_app_hostnames', pre=True, always=True)
     def shared_app_hostnames_validator(cls, v, values, **kwargs):
         sname = 'shared_app_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         if len(v) == 0:
             v = [
@@ -572,12 +572,12 @@ class HubSettings(BaseSettings):
     @validator('additional_shared_lan_app_https_hostnames', pre=True, always=True)
     def additional_shared_lan_app_hostnames_validator(cls, v, values, **kwargs):
         sname = 'additional_shared_lan_app_https_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         v = sorted(list(set(v)))
         return v
@@ -604,12 +604,12 @@ class HubSettings(BaseSettings):
     @validator('shared_lan_app_https_hostnames', pre=True, always=True)
     def shared_lan_app_https_hostnames_validator(cls, v, values, **kwargs):
         sname = 'shared_lan_app_https_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         if len(v) == 0:
             v = [
@@ -632,12 +632,12 @@ class HubSettings(BaseSettings):
     @validator('additional_shared_lan_app_http_hostnames', pre=True, always=True)
     def additional_shared_lan_app_http_hostnames_validator(cls, v, values, **kwargs):
         sname = 'additional_shared_lan_app_http_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         v = sorted(list(set(v)))
         return v
@@ -674,12 +674,12 @@ class HubSettings(BaseSettings):
     @validator('shared_lan_app_http_hostnames', pre=True, always=True)
     def shared_lan_app_http_hostnames_validator(cls, v, values, **kwargs):
         sname = 'shared_lan_app_http_hostnames'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", sname, v, values, kwargs)
         if v is None:
             v = []
         elif isinstance(v, str):
             v = [] if v == '' else v.split(',')
-        if not isinstance(v, list) or not all([isinstance(x, str) for x in v]):
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
             raise HubConfigError(f"Setting {sname}={v!r} must be None, a list of strings, or a comma-delimited string; edit config.yml")
         if len(v) == 0:
             v = [
@@ -694,12 +694,18 @@ class HubSettings(BaseSettings):
 
     @classmethod    
     def _validate_env_dict(cls, field_name: str, v, values, base_env: Optional[Dict[str, str]]=None, **kwargs) -> Dict[str, str]:
-        logger.debug(f"{field_name}_validator: v={v}, values={values}, kwargs={kwargs}")
         if v is None:
             v = {}
         if not isinstance(v, dict):
             raise HubConfigError(f"Setting {field_name}={v!r} must be a dictionary; edit config.yml")
-        if not base_env is None:
+        # The result is modified in place by the field validators, so it is always a new dict
+        # and never the caller's or the base field's. Most stacks add few or no variables of
+        # their own, so the empty cases are a single copy instead of a merge.
+        if not base_env:
+            v = dict(v)
+        elif not v:
+            v = dict(base_env)
+        else:
             v = { **base_env, **v }
         return v
 
@@ -711,9 +717,9 @@ class HubSettings(BaseSettings):
                 raise HubConfigError(f"Setting {field_name}.{k!r}={pv!r} invalid environment variable name; edit config.yml")
             if pv is None:
                 del v[k]
-            elif not isinstance(v, str):
+            elif not isinstance(pv, str):
                 v[k] = str(pv)
-        logger.debug(f"{field_name}_validator: normalized environment={v}")
+        logger.debug("%s_validator: normalized environment=%r", field_name, v)
         return v
 
     @classmethod
@@ -762,6 +768,31 @@ class HubSettings(BaseSettings):
                 del env[name]
             value = None
         return value
+
+    @classmethod
+    def _set_default_log_level_env_var(cls, env: Dict[str, str], name: str, default_value: str='DEBUG') -> None:
+        """Set a log level environment variable to a default value if it is not already set, and
+        normalize it to upper case."""
+        value = cls._set_default_env_var(env, name, default_value)
+        if value is not None:
+            env[name] = value.upper()
+
+    @classmethod
+    def _validate_env_field(
+            cls,
+            field_name: str,
+            v,
+            values,
+            base_field_name: Optional[str]=None,
+            **kwargs
+          ) -> Dict[str, str]:
+        """Common first step of the env dict field validators. Validates the configured dict for
+        field_name and merges it over the already realized env dict of base_field_name, if provided.
+        The caller then adds its implicit defaults and finishes with _normalize_env_dict."""
+        # values includes the env dicts realized so far; only format it if it will be logged
+        logger.debug("%s_validator: v=%r, values=%r, kwargs=%r", field_name, v, values, kwargs)
+        base_env = None if base_field_name is None else values[base_field_name]
+        return cls._validate_env_dict(field_name, v, values, base_env=base_env, **kwargs)
             
     base_stack_env: Dict[str, str] = Field(default=None, description=usl(
         """Dictionary of environment variables that will be passed to all docker-compose stacks, including
@@ -815,8 +846,7 @@ class HubSettings(BaseSettings):
     @validator('base_stack_env', pre=True, always=True)
     def base_stack_env_validator(cls, v, values, **kwargs):
         sname = 'base_stack_env'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
-        v = cls._validate_env_dict(sname, v, values, **kwargs)
+        v = cls._validate_env_field(sname, v, values, **kwargs)
         cls._set_default_env_var(v, 'PARENT_DNS_DOMAIN', values['parent_dns_domain'])
         cls._set_default_env_var(v, 'SHARED_APP_DNS_NAME', values['shared_app_dns_name'])
         cls._set_default_env_var(v, 'SHARED_APP_DEFAULT_PATH', values['shared_app_default_path'])
@@ -863,8 +893,7 @@ class HubSettings(BaseSettings):
     @validator('base_app_stack_env', pre=True, always=True)
     def base_app_stack_env_validator(cls, v, values, **kwargs):
         sname = 'base_app_stack_env'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
-        v = cls._validate_env_dict(sname, v, values, base_env=values['base_stack_env'], **kwargs)
+        v = cls._validate_env_field(sname, v, values, base_field_name='base_stack_env', **kwargs)
         return cls._normalize_env_dict(sname, v)
 
     traefik_stack_env: Dict[str, str] = Field(default=None, description=usl(
@@ -893,13 +922,11 @@ class HubSettings(BaseSettings):
     @validator('traefik_stack_env', pre=True, always=True)
     def traefik_stack_env_validator(cls, v, values, **kwargs):
         sname = 'traefik_stack_env'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
-        v = cls._validate_env_dict(sname, v, values, base_env=values['base_stack_env'], **kwargs)
+        v = cls._validate_env_field(sname, v, values, base_field_name='base_stack_env', **kwargs)
         cls._set_default_env_var(v, 'TRAEFIK_VERSION', values['traefik_version'])
         cls._set_default_env_var(v, 'TRAEFIK_DNS_NAME', values['traefik_dashboard_dns_name'])
         cls._set_default_env_var(v, 'TRAEFIK_HTPASSWD', values['traefik_dashboard_htpasswd'])
-        cls._set_default_env_var(v, 'TRAEFIK_LOG_LEVEL', 'DEBUG')
-        v['TRAEFIK_LOG_LEVEL'] = v['TRAEFIK_LOG_LEVEL'].upper()
+        cls._set_default_log_level_env_var(v, 'TRAEFIK_LOG_LEVEL')
 
         return cls._normalize_env_dict(sname, v)
 
@@ -923,10 +950,7 @@ class HubSettings(BaseSettings):
     @validator('portainer_runtime_env', pre=True, always=True)
     def portainer_runtime_env_validator(cls, v, values, **kwargs):
         sname = 'portainer_runtime_env'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
-        v = cls._validate_env_dict(sname, v, values, base_env=values['base_app_stack_env'], **kwargs)
-
-        
+        v = cls._validate_env_field(sname, v, values, base_field_name='base_app_stack_env', **kwargs)
         return cls._normalize_env_dict(sname, v)
 
     portainer_stack_env: Dict[str, str] = Field(default=None, description=usl(
@@ -959,24 +983,39 @@ class HubSettings(BaseSettings):
     @validator('portainer_stack_env', pre=True, always=True)
     def portainer_stack_env_validator(cls, v, values, **kwargs):
         sname = 'portainer_stack_env'
-        logger.debug(f"{sname}_validator: v={v}, values={values}, kwargs={kwargs}")
-        v = cls._validate_env_dict(sname, v, values, base_env=values['base_stack_env'], **kwargs)
+        v = cls._validate_env_field(sname, v, values, base_field_name='base_stack_env', **kwargs)
         cls._set_default_env_var(v, 'PORTAINER_VERSION', values['portainer_version'])
         cls._set_default_env_var(v, 'PORTAINER_DNS_NAME', values['portainer_dns_name'])
         cls._set_default_env_var(v, 'PORTAINER_AGENT_SECRET', values['portainer_agent_secret'])
         cls._set_default_env_var(v, 'PORTAINER_INITIAL_PASSWORD_HASH', values['portainer_initial_password_hash'])
-        cls._set_default_env_var(v, 'PORTAINER_LOG_LEVEL', 'DEBUG')
-        v['PORTAINER_LOG_LEVEL'] = v['PORTAINER_LOG_LEVEL'].upper()
-        cls._set_default_env_var(v, 'PORTAINER_AGENT_LOG_LEVEL', 'DEBUG')
-        v['PORTAINER_AGENT_LOG_LEVEL'] = v['PORTAINER_AGENT_LOG_LEVEL'].upper()
+        cls._set_default_log_level_env_var(v, 'PORTAINER_LOG_LEVEL')
+        cls._set_default_log_level_env_var(v, 'PORTAINER_AGENT_LOG_LEVEL')
         return cls._normalize_env_dict(sname, v)
 
-@cache
-def hub_settings(**params) -> HubSettings:
+# Bounded, so a long-lived process does not keep every superseded instance each time config.yml changes
+@lru_cache(maxsize=4)
+def _load_hub_settings(project_dir: str, config_yml_mtime_ns: Optional[int], **params) -> HubSettings:
+    # project_dir and config_yml_mtime_ns are only cache keys; HubSettings resolves both itself
     return HubSettings(**params)
 
+def _get_config_yml_mtime_ns(project_dir: str) -> Optional[int]:
+    try:
+        return os.stat(os.path.join(project_dir, 'config.yml')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def hub_settings(**params) -> HubSettings:
+    """
+    Return a HubSettings instance for the given init parameters.
+
+    Instances are memoized per project directory. A single stat of config.yml is
+    done on each call, so the settings are only reparsed after config.yml changes.
+    """
+    project_dir = get_project_dir()
+    return _load_hub_settings(project_dir, _get_config_yml_mtime_ns(project_dir), **params)
+
 def clear_hub_settings_cache() -> None:
-    hub_settings.cache_clear()
+    _load_hub_settings.cache_clear()
 
 _current_hub_settings: Optional[HubSettings] = None
 _current_hub_settings_lock: Lock = Lock()
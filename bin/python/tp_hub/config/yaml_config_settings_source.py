@@ -9,9 +9,7 @@ A Pydantic settings source that reads a YAML file.
 """
 
 import sys
-import yaml
 import os
-from copy import deepcopy
 
 from pydantic.fields import FieldInfo
 
@@ -21,6 +19,8 @@ from pydantic_settings import (
   )
 
 from ..proj_dirs import get_project_dir
+from ..yaml_cache import load_yaml_file_cached
+from ..util import copy_jsonable
 
 from ..internal_types import *
 
@@ -45,18 +45,19 @@ class YAMLConfigSettingsSource(PydanticBaseSettingsSource):
             project_dir = get_project_dir()
             file_path = os.path.join(project_dir, self.config_file)
             if os.path.exists(file_path):
-                encoding = self.config.get('env_file_encoding')
-                with open(file_path, 'r', encoding=encoding) as f:
-                    parent_jsonable = yaml.safe_load(f)
-                    if not isinstance(parent_jsonable, dict):
-                        raise TypeError(
-                            f"YAML config file {file_path} must contain a dictionary"
-                        )
-                    if 'hub' in parent_jsonable and isinstance(parent_jsonable['hub'], dict):
-                        self.cached_jsonable = parent_jsonable['hub']
-                    else:
-                        print(f"WARNING: YAML config file {file_path} does not contain a 'hub' section", file=sys.stderr)
-                        self.cached_jsonable = {}
+                encoding = self.config.get('env_file_encoding') or 'utf-8'
+                # The parsed result is shared with other readers of the same content; it is
+                # only read here, and __call__ returns a copy.
+                parent_jsonable = load_yaml_file_cached(file_path, encoding=encoding)
+                if not isinstance(parent_jsonable, dict):
+                    raise TypeError(
+                        f"YAML config file {file_path} must contain a dictionary"
+                    )
+                if 'hub' in parent_jsonable and isinstance(parent_jsonable['hub'], dict):
+                    self.cached_jsonable = parent_jsonable['hub']
+                else:
+                    print(f"WARNING: YAML config file {file_path} does not contain a 'hub' section", file=sys.stderr)
+                    self.cached_jsonable = {}
             else:
                 self.cached_jsonable = {}
         return self.cached_jsonable
@@ -108,7 +109,7 @@ class YAMLConfigSettingsSource(PydanticBaseSettingsSource):
     def __call__(self) -> Dict[str, Any]:
         """Return a deep dictionary of settings initializer values from this source"""
 
-        d: Dict[str, Any] = deepcopy(self.get_jsonable())
+        d: Dict[str, Any] = copy_jsonable(self.get_jsonable())
 
         #d: Dict[str, Any] = {}
         # for field_name, field in self.settings_cls.model_fields.items():
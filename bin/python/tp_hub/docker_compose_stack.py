@@ -11,22 +11,97 @@ Handy Python utilities for this project
 from __future__ import annotations
 
 import os
-
-from .internal_types import *
+import json
+from functools import lru_cache
+from collections import ChainMap
+from types import MappingProxyType
+
+from .internal_types import (
+    Dict, List, Optional, Union, Tuple, Mapping, Iterable, TracebackType,
+    JsonableDict, HubError,
+  )
 from .pkg_logging import logger
 
 from .util import (
     docker_compose_call,
     docker_compose_call_output,
+    docker_compose_call_many,
+    loads_ndjson,
   )
 
+_value_long_options = frozenset([
+    "--ansi", "--env-file", "--file", "--parallel", "--profile",
+    "--progress", "--project-directory", "--project-name"])
+"""Long docker-compose global options that take a value in the following argument"""
+
+_value_short_options = frozenset(["-f", "-p"])
+"""Short docker-compose global options that take a value in the following argument"""
+
+_stack_option_long_names: Dict[str, str] = {
+    "-f": "--file",
+    "--file": "--file",
+    "-p": "--project-name",
+    "--project-name": "--project-name",
+    "--project-directory": "--project-directory",
+  }
+"""Map of the global options that DockerComposeStack interprets itself, to their long names"""
+
+@lru_cache(maxsize=256)
+def _tokenize_options(options: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Parse docker-compose global options into (option_name, option_value) pairs.
+    Grouped short options are expanded; options without a value have an empty
+    option_value.
+
+    The result is cached, since many stacks are typically created with the same options.
+    """
+    option_pairs: List[Tuple[str, str]] = []
+    i = 0
+    while i < len(options):
+        option = options[i]
+        i += 1
+        if option.startswith("-"):
+            has_value_arg: bool = False
+            option_name: str = ""
+            option_value: str = ""
+            if option.startswith("--"):
+                option_name, sep, option_value = option.partition('=')
+                if sep:
+                    option_pairs.append((option_name, option_value))
+                else:
+                    has_value_arg = option_name in _value_long_options
+            else:
+                for i_opt_ch, opt_ch in enumerate(option[1:]):
+                    option_name = "-" + opt_ch
+                    has_value_arg = option_name in _value_short_options
+                    if has_value_arg:
+                        if i_opt_ch < len(option) - 2:
+                            raise HubError(f"Option {option_name} must be last in a group of options")
+                        break
+                    option_pairs.append((option_name, ""))
+            if has_value_arg:
+                if i >= len(options):
+                    raise HubError(f"Missing option value after {option_name}")
+                option_value = options[i]
+                i += 1
+                option_pairs.append((option_name, option_value))
+    return tuple(option_pairs)
+
+_up_container_states = frozenset(["running", "restarting", "paused"])
+"""Container states listed by "docker compose ps" without --all, i.e., containers that are up"""
+
 class DockerComposeStack:
     """
     An object-oriented interface and context manager for a docker-compose
     stack that can be brought up and down during a context lifetime.
     """
-    env: Dict[str, str]
-    """The environment variables to use when calling docker-compose"""
+    env: Mapping[str, str]
+    """The environment variables to use when calling docker-compose. This is a read-only
+       view of additional_env layered over the base environment; it is only copied into a
+       real dict when docker-compose is first called."""
+
+    _call_env: Optional[Dict[str, str]] = None
+    """The flattened copy of env passed to docker-compose, built on first use"""
 
     cwd: Optional[str]
     """The current working directory to use when calling docker-compose"""
@@ -69,6 +144,13 @@ class DockerComposeStack:
     up_stderr_exception: bool
     """Whether to capture stderr and include in exception when the context is entered."""
 
+    _container_infos: Optional[List[JsonableDict]] = None
+    """Cached result of get_container_infos(); discarded whenever docker-compose is called for
+       anything else, and when a context for the stack is entered or exited"""
+
+    _context_depth: int = 0
+    """The number of currently entered contexts for the stack. get_container_infos() only
+       reuses its cached result while a context is entered."""
 
     def __init__(
             self,
@@ -289,49 +371,18 @@ class DockerComposeStack:
                     compose_files.append(file)
         for compose_file_name in compose_files:
             self.options.extend(["-f", compose_file_name])
-        option_pairs: List[Tuple[str, str]] = []
-        i = 0
-        while i < len(self.options):
-            if self.options[i] .startswith("-"):
-                option = self.options[i]
-                i += 1
-                has_value_arg: bool = False
-                option_name: str = ""
-                option_value: str = ""
-                if option.startswith("--"):
-                    if "=" in option:
-                        option_name, option_value = option.split('=', 1)
-                        option_pairs.append((option_name, option_value))
-                    else:
-                        option_name = option
-                        has_value_arg = option_name in [
-                            "--ansi", "--env-file", "--file", "--parallel", "--profile",
-                            "--progress","--project-directory", "--project-name"]
-                else:
-                    for i_opt_ch, opt_ch in enumerate(option[1:]):
-                        option_name = "-" + opt_ch
-                        has_value_arg = option_name in ["-f", "-p"]
-                        if has_value_arg:
-                            if i_opt_ch < len(option) - 2:
-                                raise HubError(f"Option {option_name} must be last in a group of options")
-                            break
-                        option_pairs.append((option_name, ""))
-                if has_value_arg:
-                    if i >= len(self.options):
-                        raise HubError(f"Missing option value after {option_name}")
-                    option_value = self.options[i]
-                    i += 1
-                    option_pairs.append((option_name, option_value))
+        option_pairs = _tokenize_options(tuple(self.options))
         logger.debug(f"DockerComposeStack: option_pairs: {option_pairs}")
         project_directory = None
         project_name = None
         docker_compose_files: List[str] = []
         for option_name, option_value in option_pairs:
-            if option_name in ("-f", "--file"):
+            long_option_name = _stack_option_long_names.get(option_name)
+            if long_option_name == "--file":
                 docker_compose_files.append(option_value)
-            elif option_name == "--project-directory":
+            elif long_option_name == "--project-directory":
                 project_directory = option_value
-            elif option_name in ("-p", "--project-name"):
+            elif long_option_name == "--project-name":
                 project_name = option_value
         if project_directory is None:
             if len(docker_compose_files) > 0:
@@ -390,11 +441,22 @@ class DockerComposeStack:
         elif remove_local_images:
             self.down_options.append("--rmi=local")
 
-        self.env = dict(os.environ if env is None else env)
-        if additional_env is not None:
-            self.env.update(additional_env)
+        self.env = MappingProxyType(ChainMap(
+            dict(additional_env) if additional_env is not None else {},
+            os.environ if env is None else dict(env)
+          ))
         self.cwd = cwd
 
+    def _get_call_env(self) -> Dict[str, str]:
+        """
+        Get the environment to pass to docker-compose, flattening env on first use only
+        """
+        result = self._call_env
+        if result is None:
+            result = dict(self.env)
+            self._call_env = result
+        return result
+
     def call(
             self,
             args: List[str],
@@ -406,9 +468,10 @@ class DockerComposeStack:
         Automatically uses sudo if login session is not yet in the "docker" group.
         If an error occurs, stderr output is printed and an exception is raised.
         """
+        self._container_infos = None
         docker_compose_call(
             self.options + args,
-            env=self.env,
+            env=self._get_call_env(),
             cwd=self.cwd,
             stderr_exception=stderr_exception,
           )
@@ -424,9 +487,10 @@ class DockerComposeStack:
         Automatically uses sudo if login session is not yet in the "docker" group.
         If an error occurs, stderr output is printed and an exception is raised.
         """
+        self._container_infos = None
         return docker_compose_call_output(
             self.options + args,
-            env=self.env,
+            env=self._get_call_env(),
             cwd=self.cwd,
             stderr_exception=stderr_exception,
           )
@@ -457,23 +521,43 @@ class DockerComposeStack:
         options = [] if options is None else options
         self.call(["ps"] + options)
 
+    def get_container_infos(self, force_refresh: bool=False) -> List[JsonableDict]:
+        """
+        Get information about all of the stack's containers, including stopped containers,
+        as reported by "docker compose ps --all --format json".
+
+        The result is cached, so multiple queries about the stack's containers need only
+        one docker-compose call, until the stack is next modified through this object.
+        The cached result is only reused within a context for the stack; outside of a
+        context, or if force_refresh is True, docker-compose is always queried.
+        """
+        if force_refresh or self._context_depth == 0 or self._container_infos is None:
+            text = self.call_output(["ps", "--all", "--format", "json"]).strip()
+            # Older versions of docker compose emit a single JSON array rather than newline-delimited JSON
+            container_infos: List[JsonableDict] = json.loads(text) if text.startswith("[") else loads_ndjson(text)
+            self._container_infos = container_infos
+        return self._container_infos
+
     def has_running_containers(self) -> bool:
         """
-        Return True if the stack has any running containers
+        Return True if the stack has any running containers. As with "docker compose ps -q",
+        restarting and paused containers are counted as running.
         """
-        text = self.call_output(["ps", "-q"])
-        return text.rstrip() != ""
+        return any(info.get("State") in _up_container_states for info in self.get_container_infos())
 
     def __enter__(self) -> DockerComposeStack:
         """Enters a context for the stack, bringing it down if auto_down_on_enter is True,
            then bringing it up if auto_up is True.
         """
+        self._container_infos = None
+        self._context_depth += 1
         try:
             if self.auto_down_on_enter:
                 self.down()
             if self.auto_up:
                 self.up(stderr_exception=self.up_stderr_exception)
         except BaseException as e:
+            self._context_depth -= 1
             if self.auto_up:
                 logger.debug("Failed to start docker-compose stack; tearing down")
                 self.down()
@@ -487,6 +571,46 @@ class DockerComposeStack:
             exc_tb: TracebackType
           ) -> None:
         """Exits a context for the stack, bringing it down if auto_down is True"""
+        self._container_infos = None
+        self._context_depth -= 1
         if self.auto_down:
             self.down()
 
+def call_docker_compose_stacks(
+        stack_calls: Iterable[Tuple[DockerComposeStack, List[str]]],
+        *,
+        stderr_exception: bool=False,
+      ) -> None:
+    """
+    Call docker-compose concurrently for several stacks, each with its stack options and
+    the given arguments. If any of the calls fail, the first failure (in order) is raised
+    after all of the calls have completed.
+    """
+    calls: List[Tuple[List[str], Dict[str, str], Optional[str]]] = []
+    for stack, args in stack_calls:
+        stack._container_infos = None
+        calls.append((stack.options + args, stack._get_call_env(), stack.cwd))
+    docker_compose_call_many(calls, stderr_exception=stderr_exception)
+
+def up_docker_compose_stacks(stacks: Iterable[DockerComposeStack], stderr_exception: bool=False) -> None:
+    """
+    Start several stacks concurrently. The stacks must not depend on each other, and a
+    failure to start one does not prevent the others from being started.
+
+    Unless stderr_exception is True, the docker-compose progress output of all of the
+    stacks is written to the terminal at the same time and will be interleaved.
+    """
+    call_docker_compose_stacks(
+        [ (stack, ["up"] + stack.up_options) for stack in stacks ],
+        stderr_exception=stderr_exception
+      )
+
+def down_docker_compose_stacks(stacks: Iterable[DockerComposeStack], stderr_exception: bool=False) -> None:
+    """
+    Stop several stacks concurrently. As with up_docker_compose_stacks(), output is
+    interleaved unless stderr_exception is True.
+    """
+    call_docker_compose_stacks(
+        [ (stack, ["down"] + stack.down_options) for stack in stacks ],
+        stderr_exception=stderr_exception
+      )
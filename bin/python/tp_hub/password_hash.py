@@ -10,26 +10,51 @@ Password hashing using bcrypt.  Compatible with htpasswd
 
 from __future__ import annotations
 
+import os
 import bcrypt
 
 from .pkg_logging import logger
 
 from .internal_types import *
 
-def hash_password(password: str) -> str:
+_fallback_bcrypt_cost = 10
+
+def _get_default_bcrypt_cost() -> int:
+    cost_str = os.environ.get("TP_HUB_BCRYPT_COST")
+    if cost_str is None or cost_str == '':
+        return _fallback_bcrypt_cost
+    try:
+        cost = int(cost_str)
+        if 4 <= cost <= 31:
+            return cost
+    except ValueError:
+        pass
+    logger.warning(f"Invalid TP_HUB_BCRYPT_COST {cost_str!r}; must be an integer in 4..31; using {_fallback_bcrypt_cost}")
+    return _fallback_bcrypt_cost
+
+DEFAULT_BCRYPT_COST = _get_default_bcrypt_cost()
+"""
+The default bcrypt work factor (log2 of the number of rounds) used by hash_password. May be
+overridden with the TP_HUB_BCRYPT_COST environment variable. Each increment doubles the time
+required to compute (or brute-force) a hash.
+"""
+
+def hash_password(password: str, cost: Optional[int]=None) -> str:
     """
     Hash a password using bcrypt, in a format compatible with htpasswd.
 
+    cost is the bcrypt work factor; if None, DEFAULT_BCRYPT_COST is used.
+
     Returns a string that begins with "$2" and contains the bcrypt hash.
     Does not include a "<username>:" prefix.
     """
+    if cost is None:
+        cost = DEFAULT_BCRYPT_COST
     # Note: The salt is more than just random data; it also includes the bcrypt
-    # algorithm identifier and the number of rounds. The number of rounds is adjusted
-    # periodically to keep up with the increasing speed of hardware. Currently the default
-    # in bcrypt.gensalt() is 12 rounds.
+    # algorithm identifier and the number of rounds.
     # the prefix passed to gensalt() is the bcrypt algorithm identifier, which is "2b"
     # by default. The "2" indicates the algorithm version.
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=cost)
     bin_cleartext = password.encode("utf-8")
     bin_hashed = bcrypt.hashpw(bin_cleartext, salt)
     hashed_str = bin_hashed.decode("utf-8")
@@ -47,13 +72,15 @@ def check_password(hashed: str, password: str) -> bool:
     result = bcrypt.checkpw(bin_cleartext, bin_hashed)
     return result
 
-def hash_username_password(username: str, password: str) -> str:
+def hash_username_password(username: str, password: str, cost: Optional[int]=None) -> str:
     """
     Hash a username/password using bcrypt, in a format compatible with htpasswd.
 
+    cost is the bcrypt work factor; if None, DEFAULT_BCRYPT_COST is used.
+
     Returns a string in the format "{username}:{bcrypt_hash}"
     """
-    hashed_str = hash_password(password)
+    hashed_str = hash_password(password, cost=cost)
     result = f"{username}:{hashed_str}"
     return result
 
@@ -61,10 +88,10 @@ def check_username_password(hashed: str, username: str, password: str) -> bool:
     """
     Check a username/password against a hash in the format "{username}:{bcrypt_hash}".
     """
-    if not ':' in hashed:
+    encoded_username, sep, hashed_str = hashed.partition(":")
+    if not sep:
         logger.warning("check_username_password: Invalid hashed password, ':' not present... did you mean to use check_password?")
         return False
-    encoded_username, hashed_str = hashed.split(":", 1)
     if encoded_username != username:
         return False
     result = check_password(hashed_str, password)
@@ -9,7 +9,6 @@ Logging for this package.
 """
 
 from __future__ import annotations
-import socket
 
 import logging
 
@@ -11,9 +11,8 @@ Access project and package directories
 from __future__ import annotations
 
 import os
-import socket
 from functools import cache
-from .internal_types import *
+from .internal_types import Optional
 from threading import Lock
 
 _lock = Lock()
@@ -44,18 +43,27 @@ def set_project_dir(project_dir: str) -> None:
     with _lock:
         global _project_dir
         _project_dir = project_dir
+        # Paths derived from the project directory are cached
+        get_project_bin_dir.cache_clear()
+        get_project_python_dir.cache_clear()
+        get_project_bin_data_dir.cache_clear()
+        get_project_build_dir.cache_clear()
 
 def get_project_dir() -> str:
     """
     Get the path to the project directory
     """
     global _project_dir
-    with _lock:
-        if _project_dir is None:
-            _project_dir = os.path.abspath(os.path.join(get_tp_hub_package_dir(), "..", "..", ".."))
-        result = _project_dir
+    # Fast path: once set, the value is read without taking the lock (a global read is atomic)
+    result = _project_dir
+    if result is None:
+        with _lock:
+            if _project_dir is None:
+                _project_dir = os.path.abspath(os.path.join(get_tp_hub_package_dir(), "..", "..", ".."))
+            result = _project_dir
     return result
 
+@cache
 def get_project_bin_dir() -> str:
     """
     Get the path to the project bin directory
@@ -63,6 +71,7 @@ def get_project_bin_dir() -> str:
     result = os.path.join(get_project_dir(), 'bin')
     return result
 
+@cache
 def get_project_python_dir() -> str:
     """
     Get the path to the project python directory (added to PYTHONPATH)
@@ -70,6 +79,7 @@ def get_project_python_dir() -> str:
     result = os.path.join(get_project_bin_dir(), "python")
     return result
 
+@cache
 def get_project_bin_data_dir() -> str:
     """
     Get the path to the project bin data directory
@@ -77,6 +87,7 @@ def get_project_bin_data_dir() -> str:
     result = os.path.join(get_project_bin_dir(), 'data')
     return result
 
+@cache
 def get_project_build_dir() -> str:
     """
     Get the path to the project build directory
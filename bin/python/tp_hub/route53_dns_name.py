@@ -3,6 +3,8 @@
 import os
 import sys
 import re
+import ipaddress
+import time
 import dotenv
 import argparse
 import json
@@ -13,7 +15,7 @@ import boto3
 from boto3 import Session
 from botocore.client import BaseClient
 from mypy_boto3_route53 import Route53Client
-from mypy_boto3_route53.type_defs import HostedZoneTypeDef, ResourceRecordSetPaginatorTypeDef, ResourceRecordSetTypeDef, ResourceRecordTypeDef
+from mypy_boto3_route53.type_defs import HostedZoneTypeDef, ResourceRecordSetPaginatorTypeDef, ResourceRecordSetTypeDef, ResourceRecordTypeDef, ChangeTypeDef
 from threading import Lock
 from .internal_types import *
 from .pkg_logging import logger
@@ -23,32 +25,154 @@ from .util import (
     resolve_public_dns,
   )
 
-_ipv4_re = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+def _looks_like_ipv4(s: str) -> bool:
+    """
+    Return True if s is a dotted-quad IPv4 address. Unlike a simple regular expression,
+    this rejects out-of-range octets such as "999.0.0.1".
+    """
+    try:
+        ipaddress.IPv4Address(s)
+    except ValueError:
+        return False
+    return True
+
+_shared_session_kwargs = frozenset(["profile_name", "region_name"])
+"""Session keyword arguments that do not prevent an AwsContext from sharing sessions and clients
+   with other AwsContexts. Explicit credentials, for example, do."""
+
+_shared_clients_lock = Lock()
+_shared_sessions: Dict[Tuple[Optional[str], Optional[str]], Session] = {}
+"""boto3 sessions shared by AwsContexts, keyed by (profile_name, region_name)"""
+_shared_clients: Dict[Tuple[Optional[str], Optional[str], str], BaseClient] = {}
+"""boto3 clients shared by AwsContexts, keyed by (profile_name, region_name, client_name). botocore
+   clients are thread-safe."""
+
+class _TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+    """
+    rate: float
+    capacity: float
+    _tokens: float
+    _last: float
+    _lock: Lock
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, waiting until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            # A negative balance is the time, in tokens, that this caller must wait. Reserving it under
+            # the lock and sleeping outside the lock keeps concurrent callers in order.
+            wait_seconds = -self._tokens / self.rate if self._tokens < 0.0 else 0.0
+        if wait_seconds > 0.0:
+            time.sleep(wait_seconds)
+
+_route53_rate_limiter = _TokenBucket(rate=5.0, capacity=5.0)
+"""Client-side limit on Route53 API requests, which Route53 throttles at 5 requests per second
+   per account. Waiting here is cheaper than botocore's retry backoff after a Throttling error."""
+
+_route53_rate_limited_methods = frozenset([
+    "list_hosted_zones_by_name",
+    "list_resource_record_sets",
+    "change_resource_record_sets",
+    "get_hosted_zone",
+  ])
+
+class _RateLimitedRoute53Client:
+    """
+    A proxy for a Route53 client that rate-limits the API calls made by this module.
+    """
+    _client: BaseClient
+
+    def __init__(self, client: BaseClient):
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._client, name)
+        if name in _route53_rate_limited_methods:
+            method = value
+            def rate_limited_method(*args: Any, **kwargs: Any) -> Any:
+                _route53_rate_limiter.acquire()
+                return method(*args, **kwargs)
+            return rate_limited_method
+        return value
 
 class AwsContext:
     """
     A context for AWS operations within a single AWS session.
     
-    AWS service clients are cached for reuse.
+    AWS service clients are cached for reuse. Contexts that are created with no session
+    arguments other than profile_name and region_name share a session and clients with
+    other such contexts for the same profile and region.
     
     This class is thread-safe.
     """
     _lock: Lock
     aws_session: Session
     clients: Dict[str, BaseClient]
+    _shared_key: Optional[Tuple[Optional[str], Optional[str]]]
+    """(profile_name, region_name) if this context shares its session and clients with other contexts"""
+    _route53: Optional[_RateLimitedRoute53Client]
+    """The rate-limited Route53 client proxy, created on first use"""
+    _zone_info_by_name: Dict[Tuple[str, bool], HostedZoneTypeDef]
+    """Cache of hosted zone info, keyed by (zone_dns_name, public). See get_hosted_zone_info()."""
+    _zone_name_by_id: Dict[str, str]
+    """Cache of hosted zone names, keyed by zone ID. See get_hosted_zone_name()."""
 
     def __init__(self, *, aws_session: Optional[Session]=None, from_aws_client: Optional[BaseClient]=None, **kwargs):
         self._lock = Lock()
+        self._shared_key = None
+        self._route53 = None
         if aws_session is None:
             if from_aws_client is not None and hasattr(from_aws_client, '_internal_aws_context'):
                 aws_session = cast(Session, from_aws_client._internal_aws_context.aws_session)   # type: ignore[attr-defined]
+            elif _shared_session_kwargs.issuperset(kwargs):
+                # Building a session (and its clients) is expensive, so plain profile/region sessions
+                # are shared by all contexts
+                shared_key = (kwargs.get("profile_name"), kwargs.get("region_name"))
+                with _shared_clients_lock:
+                    aws_session = _shared_sessions.get(shared_key)
+                    if aws_session is None:
+                        aws_session = boto3.session.Session(**kwargs)
+                        aws_session._internal_aws_context = self  # type: ignore[attr-defined]
+                        _shared_sessions[shared_key] = aws_session
+                self._shared_key = shared_key
             else:
                 aws_session = boto3.session.Session(**kwargs)
                 aws_session._internal_aws_context = self  # type: ignore[attr-defined]
         self.aws_session = aws_session
         self.clients = {}
+        self._zone_info_by_name = {}
+        self._zone_name_by_id = {}
 
     def client(self, client_name: str) -> BaseClient:
+        # Fast path without locking; dict lookups are atomic
+        client = self.clients.get(client_name)
+        if client is not None:
+            return client
+        if self._shared_key is not None:
+            shared_key = (self._shared_key[0], self._shared_key[1], client_name)
+            with _shared_clients_lock:
+                client = _shared_clients.get(shared_key)
+                if client is None:
+                    client = cast(BaseClient, self.aws_session.client(client_name))   # type: ignore[call-overload]
+                    client._internal_aws_context = self             # type: ignore[attr-defined]
+                    _shared_clients[shared_key] = client
+            with self._lock:
+                self.clients.setdefault(client_name, client)
+            return client
         with self._lock:
             client = self.clients.get(client_name)
             if client is None:
@@ -57,9 +181,23 @@ class AwsContext:
                 self.clients[client_name] = client
         return client
     
+    def invalidate_zone_cache(self) -> None:
+        """
+        Forget cached hosted zone information; e.g., after hosted zones have been created or deleted.
+        """
+        with self._lock:
+            self._zone_info_by_name.clear()
+            self._zone_name_by_id.clear()
+
     @property
     def route53(self) -> Route53Client:
-        return cast(Route53Client, self.client('route53'))
+        """The Route53 client, with API calls rate-limited to avoid throttling"""
+        route53 = self._route53
+        if route53 is None:
+            # Racing threads may each create a proxy for the same client; either one is fine
+            route53 = _RateLimitedRoute53Client(self.client('route53'))
+            self._route53 = route53
+        return cast(Route53Client, route53)
     
     def __str__(self) -> str:
         return f"AwsContext({self.aws_session})"
@@ -82,6 +220,13 @@ def get_aws(aws: Optional[AwsContext]=None, aws_session: Optional[Session]=None,
     return aws
 
 def get_all_hosted_zones(aws: AwsContext, starting_name: Optional[str]=None) -> Generator[HostedZoneTypeDef, None, None]:
+    """
+    Enumerate the hosted zones in the current AWS account, in name order, optionally starting at
+    starting_name.
+
+    This is intended for listing zones; to look up a single zone by name, use get_hosted_zone_info(),
+    which fetches only the zones it needs.
+    """
     route53 = aws.route53
 
     kwargs: Dict[str, Any] = {}
@@ -112,19 +257,59 @@ def get_hosted_zone_info(
 
     Returns:
         An AWS response dictionary containing information about the hosted zone
+
+    The result is cached in the AwsContext.
     """
     if not zone_dns_name.endswith("."):
         zone_dns_name += "."
+    cache_key = (zone_dns_name, public)
+    with aws._lock:
+        cached = aws._zone_info_by_name.get(cache_key)
+    if cached is not None:
+        return cached
+
+    matched = _find_hosted_zone_by_name(aws, zone_dns_name, public)
+
+    with aws._lock:
+        aws._zone_info_by_name[cache_key] = matched
+        aws._zone_name_by_id[matched['Id']] = zone_dns_name[:-1]
+
+    return matched
+
+def _find_hosted_zone_by_name(
+        aws: AwsContext,
+        zone_dns_name: str,
+        public: bool,
+      ) -> HostedZoneTypeDef:
+    """
+    Find the single public or private hosted zone with a fully-qualified name (including
+    the trailing "."), using direct ListHostedZonesByName calls rather than enumerating zones.
+    """
+    route53 = aws.route53
     matched: Optional[HostedZoneTypeDef] = None
-    for zone in get_all_hosted_zones(aws, starting_name=zone_dns_name):
-        if zone['Name'] == zone_dns_name and zone['Config']['PrivateZone'] == (not public):
-            if matched is not None:
-                raise HubError(f"Multiple hosted zones found for {zone_dns_name} in current AWS account")
-            matched = zone
+    # Zones are listed in name order starting at DNSName, so all zones with the requested name
+    # (there may be both a public and a private one) are at the start of the first page. Only
+    # continue to the next page if every zone on this page has the requested name.
+    kwargs: Dict[str, Any] = dict(DNSName=zone_dns_name, MaxItems='2')
+    while True:
+        response = route53.list_hosted_zones_by_name(**kwargs)
+        zones = response['HostedZones']
+        for zone in zones:
+            if zone['Name'] != zone_dns_name:
+                break
+            if zone['Config']['PrivateZone'] == (not public):
+                if matched is not None:
+                    raise HubError(f"Multiple hosted zones found for {zone_dns_name} in current AWS account")
+                matched = zone
+        else:
+            if response['IsTruncated']:
+                kwargs.update(DNSName=response['NextDNSName'], HostedZoneId=response['NextHostedZoneId'])
+                continue
+        break
 
     if matched is None:
         raise HubError(f"Hosted zone {zone_dns_name} not found in current AWS account")
-    
+
     return matched
 
 def get_hosted_zone_id(
@@ -147,12 +332,20 @@ def get_hosted_zone_name(
 
     Returns:
         The DNS name of the hosted zone. The trailing "." is removed.
+
+    The result is cached in the AwsContext.
     """
+    with aws._lock:
+        cached = aws._zone_name_by_id.get(zone_id)
+    if cached is not None:
+        return cached
     route53 = aws.route53
     response = route53.get_hosted_zone(Id=zone_id)
     result = response['HostedZone']['Name']
     if result.endswith("."):
         result = result[:-1]
+    with aws._lock:
+        aws._zone_name_by_id[zone_id] = result
     return result
 
 def get_all_resource_record_sets(
@@ -160,38 +353,53 @@ def get_all_resource_record_sets(
         zone_id: str,
         *,
         start_record_name: Optional[str]=None,
+        page_size: int=300,
       ) -> Generator[ResourceRecordSetPaginatorTypeDef, None, None]:
     """
     Get all resource record sets for a hosted zone
+
+    page_size is the number of record sets fetched per AWS request (MaxItems). The default is the
+    maximum that Route53 allows (its own default is 100); callers that only need the
+    first few record sets should pass a smaller value.
     """
     route53 = aws.route53
 
-    kwargs: Dict[str, Any] = dict(HostedZoneId=zone_id)
+    # Paginated by hand; boto3's paginator adds significant per-page overhead
+    kwargs: Dict[str, Any] = dict(HostedZoneId=zone_id, MaxItems=str(page_size))
     if start_record_name is not None:
         kwargs.update(StartRecordName=start_record_name)
 
-    paginator = route53.get_paginator('list_resource_record_sets')
-    for page in paginator.paginate(**kwargs):
-        # record_sets = cast(List[ResourceRecordSetTypeDef], page['ResourceRecordSets'])
-        record_sets = page['ResourceRecordSets']
-        for record_set in record_sets:
-            yield record_set
+    while True:
+        response = route53.list_resource_record_sets(**kwargs)
+        yield from cast(List[ResourceRecordSetPaginatorTypeDef], response['ResourceRecordSets'])
+        if not response['IsTruncated']:
+            break
+        kwargs.update(StartRecordName=response['NextRecordName'], StartRecordType=response['NextRecordType'])
+        kwargs.pop('StartRecordIdentifier', None)
+        if 'NextRecordIdentifier' in response:
+            kwargs.update(StartRecordIdentifier=response['NextRecordIdentifier'])
 
 def get_resource_record_sets(
         aws: AwsContext,
         zone_id: str,
         record_name: str,
+        *,
+        hosted_zone_dns_name: Optional[str]=None,
       ) -> List[ResourceRecordSetPaginatorTypeDef]:
     """
     Get all resource record sets for a specific name in a hosted zone
     The name can be a fully qualified name or a simple subdomain of the hosted zone.
-    """
-    route53 = aws.route53
 
-    hosted_zone_name = get_hosted_zone_name(aws, zone_id)
+    If the caller already knows the DNS name of the hosted zone, it can be passed as
+    hosted_zone_dns_name to avoid looking it up.
+    """
+    if hosted_zone_dns_name is None:
+        hosted_zone_name = get_hosted_zone_name(aws, zone_id)
+    else:
+        hosted_zone_name = hosted_zone_dns_name[:-1] if hosted_zone_dns_name.endswith(".") else hosted_zone_dns_name
     full_hosted_zone_name = f"{hosted_zone_name}."
 
-    if not "." in record_name:
+    if "." not in record_name:
         record_short_name = record_name
         record_parent_name = full_hosted_zone_name
         record_full_name = f"{record_short_name}.{record_parent_name}"
@@ -203,7 +411,11 @@ def get_resource_record_sets(
         if record_parent_name != full_hosted_zone_name:
             raise HubError(f"record_name {record_name} is not a simple subdomain of hosted zone {hosted_zone_name}")
     result: List[ResourceRecordSetPaginatorTypeDef] = []
-    for record_set in get_all_resource_record_sets(aws, zone_id, start_record_name=record_full_name):
+    # Record sets are listed in Route53's name order (by reversed labels, so not plain string order)
+    # starting at record_full_name, so all of the name's record sets come first, and listing can stop at
+    # the first one with a different name. A name rarely has more than a few record types, so a small
+    # page size avoids fetching unrelated records.
+    for record_set in get_all_resource_record_sets(aws, zone_id, start_record_name=record_full_name, page_size=10):
         if record_set['Name'] != record_full_name:
             break
         result.append(record_set)
@@ -226,30 +438,22 @@ def resource_record_sets_are_equal(
         return False
     return True
 
-def delete_route53_dns_name(
-        aws: AwsContext,
-        dns_name: str,
-        *,
-        ignore_missing: bool=True,
-      ) -> None:
-    """
-    Create a DNS name on AWS Route53.
+Route53DnsChange = Tuple[str, Optional[str], str]
+"""A requested DNS name change for apply_route53_dns_changes(): (dns_name, target, action), where
+   action is 'UPSERT' or 'DELETE', and target is None for 'DELETE'."""
 
-    Args:
-        dns_name:
-            The fully-qualified DNS name to delete (required). Must be a subdomain of
-            a hosted zone that is owned by the current AWS account.
-        ignore_missing:
-            If True, do not raise an exception if the DNS name does not exist.
-            Default is True.
-    """
-    route53 = aws.route53
+_max_route53_changes_per_batch = 500
+"""Maximum number of changes sent in one ChangeResourceRecordSets call. Route53 allows 1000
+   ResourceRecord elements per batch, and each UPSERT counts twice."""
 
+def _split_route53_dns_name(dns_name: str) -> Tuple[str, str]:
+    """
+    Validate a DNS name that is to be created/deleted, and split it into the name without
+    a trailing "." and the name of its parent hosted zone.
+    """
     if dns_name.endswith("."):
         dns_name = dns_name[:-1]
 
-    full_dns_name = f"{dns_name}."
-
     if '..' in dns_name:
         raise HubError(f"dns_name {dns_name} must not contain '..'")
     
@@ -259,33 +463,207 @@ def delete_route53_dns_name(
     if len(dns_name.split('.')) < 3:
         raise HubError(f"dns_name {dns_name} must be a subdomain of a registered hosted zone")
 
-    dns_subdomain, dns_zone_name = dns_name.split('.', 1)
+    _, dns_zone_name = dns_name.split('.', 1)
+    return dns_name, dns_zone_name
+
+def _new_route53_resource_record_set(
+        dns_name: str,
+        dns_zone_name: str,
+        target: str,
+        *,
+        verify_public_ip: bool,
+        public_ip: Optional[IPAddressOrStr],
+        ttl: int,
+      ) -> ResourceRecordSetTypeDef:
+    """
+    Build the resource record set for a DNS name that is to be created, pointing at the target,
+    which is an IPv4 address, a fully qualified DNS name, or a simple DNS subdomain of the DNS
+    name's hosted zone. See create_route53_dns_name().
+    """
+    if target == "" or target == ".":
+        raise HubError("target must not be empty")
 
-    hosted_zone_info = get_hosted_zone_info(aws, dns_zone_name)
-    hosted_zone_id = hosted_zone_info['Id']
+    target_is_ip = _looks_like_ipv4(target) or ':' in target
 
-    record_sets = get_resource_record_sets(aws, hosted_zone_id, dns_name)
-    if len(record_sets) == 0:
-        if ignore_missing:
-            logger.debug(f"DNS name {dns_name} does not exist in hosted zone {dns_zone_name}; ignoring delete request")
-            return
-        else:
-            raise HubError(f"DNS name {dns_name} does not exist in hosted zone {dns_zone_name}--cannot delete")
-    
-    response = route53.change_resource_record_sets(
-        HostedZoneId=hosted_zone_id,
-        ChangeBatch=dict(
-            Changes=[
-                dict(
-                    Action='DELETE',
-                    ResourceRecordSet=cast(ResourceRecordSetTypeDef, record_set),
-                ) for record_set in record_sets
-            ],
-        ),
-      )
-    
-    logger.debug(f"DNS name {dns_name} successfully deleted from hosted zone {dns_zone_name}: {response}")
+    resolved_ips: List[str]
+
+    if target_is_ip:
+        resolved_ips = [ target ]
+    else:
+        if '.' not in target:
+            target = f"{target}.{dns_zone_name}."
+        elif not target.endswith("."):
+            target = f"{target}."
+
+        if '..' in target:
+            raise HubError(f"target {target} must not contain '..'")
+        
+        if target.startswith("."):
+            raise HubError(f"target {target} must not start with '.'")
+        
+        resolved_ips = resolve_public_dns(target)
+
+    if verify_public_ip:
+        if len(resolved_ips) == 0:
+            raise HubError(f"Target name {target} could not be resolved to an IP addresses")
+        if public_ip not in resolved_ips:
+            raise HubError(f"Target name {target} resolves to {resolved_ips}, but required public IP address is {public_ip}")
+        if len(resolved_ips) > 1:
+            raise HubError(f"Target name {target} resolves to {resolved_ips}, which includes {public_ip}, but multiple IP addresses are not supported")
+
+    new_resource_record: ResourceRecordTypeDef = dict(
+        Value=target,
+    )
+
+    new_resource_record_set: ResourceRecordSetTypeDef = dict(
+        Name=f"{dns_name}.",
+        Type='A' if target_is_ip else 'CNAME',
+        TTL=ttl,
+        ResourceRecords=[ new_resource_record ],
+    )
+    return new_resource_record_set
 
+def apply_route53_dns_changes(
+        aws: AwsContext,
+        changes: Iterable[Route53DnsChange],
+        *,
+        verify_public_ip: Optional[bool]=None,
+        public_ip: Optional[IPAddressOrStr]=None,
+        allow_exists: bool=True,
+        allow_overwrite: bool=False,
+        ignore_missing: bool=True,
+        ttl: int=300,
+      ) -> None:
+    """
+    Create and/or delete multiple DNS names on AWS Route53, using as few AWS API calls as possible.
+
+    All of the changes are validated against the existing record sets before anything is changed.
+    Changes are then grouped by hosted zone, and each zone's changes are applied in a single
+    ChangeResourceRecordSets call (or a few, for very large numbers of changes). When a hosted zone
+    has more than one change, its existing record sets are listed once for all of them.
+
+    Args:
+        changes:
+            The changes to make, as (dns_name, target, action) tuples. action is 'UPSERT' to create
+            or update dns_name to point to target, or 'DELETE' to delete dns_name (target is ignored).
+            See create_route53_dns_name() and delete_route53_dns_name() for the meaning of dns_name
+            and target.
+        verify_public_ip, public_ip, allow_exists, allow_overwrite, ttl:
+            As for create_route53_dns_name(); applied to all 'UPSERT' changes.
+        ignore_missing:
+            As for delete_route53_dns_name(); applied to all 'DELETE' changes.
+    """
+    route53 = aws.route53
+
+    if verify_public_ip is None:
+        verify_public_ip = public_ip is not None
+
+    if verify_public_ip and public_ip is None:
+        public_ip = get_public_ipv4_egress_address()
+
+    # Validate the requests and group them by hosted zone
+    zone_requests: Dict[str, List[Tuple[str, str, str, Optional[ResourceRecordSetTypeDef]]]] = {}
+    for dns_name, target, action in changes:
+        dns_name, dns_zone_name = _split_route53_dns_name(dns_name)
+        new_resource_record_set: Optional[ResourceRecordSetTypeDef] = None
+        if action == 'UPSERT':
+            if target is None:
+                raise HubError(f"A target is required to create DNS name {dns_name}")
+            new_resource_record_set = _new_route53_resource_record_set(
+                dns_name,
+                dns_zone_name,
+                target,
+                verify_public_ip=verify_public_ip,
+                public_ip=public_ip,
+                ttl=ttl,
+              )
+        elif action != 'DELETE':
+            raise HubError(f"Unsupported DNS change action {action!r} for {dns_name}; must be 'UPSERT' or 'DELETE'")
+        hosted_zone_id = get_hosted_zone_info(aws, dns_zone_name)['Id']
+        zone_requests.setdefault(hosted_zone_id, []).append((dns_name, dns_zone_name, action, new_resource_record_set))
+
+    # Check the requests against the existing record sets, and build the change batches
+    zone_changes: Dict[str, List[ChangeTypeDef]] = {}
+    for hosted_zone_id, requests in zone_requests.items():
+        existing_by_name: Optional[Dict[str, List[ResourceRecordSetPaginatorTypeDef]]] = None
+        if len(requests) > 1:
+            existing_by_name = {}
+            for record_set in get_all_resource_record_sets(aws, hosted_zone_id):
+                existing_by_name.setdefault(record_set['Name'], []).append(record_set)
+        changes_for_zone = zone_changes.setdefault(hosted_zone_id, [])
+        for dns_name, dns_zone_name, action, new_resource_record_set in requests:
+            if existing_by_name is None:
+                record_sets = get_resource_record_sets(aws, hosted_zone_id, dns_name, hosted_zone_dns_name=dns_zone_name)
+            else:
+                record_sets = existing_by_name.get(f"{dns_name}.", [])
+            if action == 'DELETE':
+                if len(record_sets) == 0:
+                    if ignore_missing:
+                        logger.debug(f"DNS name {dns_name} does not exist in hosted zone {dns_zone_name}; ignoring delete request")
+                        continue
+                    else:
+                        raise HubError(f"DNS name {dns_name} does not exist in hosted zone {dns_zone_name}--cannot delete")
+                changes_for_zone.extend(
+                    dict(
+                        Action='DELETE',
+                        ResourceRecordSet=cast(ResourceRecordSetTypeDef, record_set),
+                    ) for record_set in record_sets
+                  )
+            else:
+                assert new_resource_record_set is not None
+                target = new_resource_record_set['ResourceRecords'][0]['Value']
+                if len(record_sets) > 1:
+                    raise HubError(f"Multiple resource record sets found for {dns_name} in hosted zone {dns_zone_name}: {record_sets}")
+                elif len(record_sets) > 0:
+                    record_set = record_sets[0]
+                    if not allow_exists:
+                        raise HubError(f"Record set for DNS name {dns_name} already exists in zone ID {hosted_zone_id}: {record_set}")
+                    if resource_record_sets_are_equal(record_set, new_resource_record_set):
+                        logger.debug(f"DNS name {dns_name} already exists and matches target {target}")
+                        continue
+                    else:
+                        if allow_overwrite:
+                            logger.info(f"DNS name {dns_name} already exists and does not match target {target}; overwriting: {record_set}")
+                        else:
+                            raise HubError(f"DNS name {dns_name} already exists, but does not match target {target}: {record_set}")
+                logger.debug(f"Creating/updating DNS name {dns_name} with target {target} in hosted zone {dns_zone_name}")
+                changes_for_zone.append(
+                    dict(
+                        Action='UPSERT',
+                        ResourceRecordSet=new_resource_record_set,
+                    )
+                  )
+
+    # Apply the changes
+    for hosted_zone_id, changes_for_zone in zone_changes.items():
+        for i in range(0, len(changes_for_zone), _max_route53_changes_per_batch):
+            batch = changes_for_zone[i:i + _max_route53_changes_per_batch]
+            response = route53.change_resource_record_sets(
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch=dict(
+                    Changes=batch,
+                ),
+              )
+            logger.debug(f"{len(batch)} DNS change(s) successfully applied to hosted zone ID {hosted_zone_id}: {response}")
+
+def delete_route53_dns_name(
+        aws: AwsContext,
+        dns_name: str,
+        *,
+        ignore_missing: bool=True,
+      ) -> None:
+    """
+    Delete a DNS name on AWS Route53.
+
+    Args:
+        dns_name:
+            The fully-qualified DNS name to delete (required). Must be a subdomain of
+            a hosted zone that is owned by the current AWS account.
+        ignore_missing:
+            If True, do not raise an exception if the DNS name does not exist.
+            Default is True.
+    """
+    apply_route53_dns_changes(aws, [ (dns_name, None, 'DELETE') ], ignore_missing=ignore_missing)
 
 def create_route53_dns_name(
         aws: AwsContext,
@@ -336,103 +714,12 @@ def create_route53_dns_name(
             The time-to-live property of the DNS name (how long clients and DNS servers will
             cache the DNS name's results). Default is 300 seconds (5 minutes).
     """
-    route53 = aws.route53
-
-    if target == "" or target == ".":
-        raise HubError("target must not be empty")
-
-    if verify_public_ip is None:
-        verify_public_ip = public_ip is not None
-
-    if verify_public_ip and public_ip is None:
-        public_ip = get_public_ipv4_egress_address()
-
-    if dns_name.endswith("."):
-        dns_name = dns_name[:-1]
-
-    full_dns_name = f"{dns_name}."
-
-    if '..' in dns_name:
-        raise HubError(f"dns_name {dns_name} must not contain '..'")
-    
-    if dns_name.startswith("."):
-        raise HubError(f"dns_name {dns_name} must not start with '.'")
-    
-    if len(dns_name.split('.')) < 3:
-        raise HubError(f"dns_name {dns_name} must be a subdomain of a registered hosted zone")
-
-    dns_subdomain, dns_zone_name = dns_name.split('.', 1)
-
-    target_is_ip = _ipv4_re.match(target) is not None or ':' in target
-
-    resolved_ips: List[str]
-
-    if target_is_ip:
-        resolved_ips = [ target ]
-    else:
-        if not '.' in target:
-            target = f"{target}.{dns_zone_name}."
-        elif not target.endswith("."):
-            target = f"{target}."
-
-        if '..' in target:
-            raise HubError(f"target {target} must not contain '..'")
-        
-        if target.startswith("."):
-            raise HubError(f"target {target} must not start with '.'")
-        
-        resolved_ips = resolve_public_dns(target)
-
-
-    if verify_public_ip:
-        if len(resolved_ips) == 0:
-            raise HubError(f"Target name {target} could not be resolved to an IP addresses")
-        if public_ip not in resolved_ips:
-            raise HubError(f"Target name {target} resolves to {resolved_ips}, but required public IP address is {public_ip}")
-        if len(resolved_ips) > 1:
-            raise HubError(f"Target name {target} resolves to {resolved_ips}, which includes {public_ip}, but multiple IP addresses are not supported")
-
-    new_resource_record: ResourceRecordTypeDef = dict(
-        Value=target,
-    )
-
-    new_resource_record_set: ResourceRecordSetTypeDef = dict(
-        Name=full_dns_name,
-        Type='A' if target_is_ip else 'CNAME',
-        TTL=ttl,
-        ResourceRecords=[ new_resource_record ],
-    )
-        
-    hosted_zone_info = get_hosted_zone_info(aws, dns_zone_name)
-    hosted_zone_id = hosted_zone_info['Id']
-
-    record_sets = get_resource_record_sets(aws, hosted_zone_id, dns_name)
-
-    if len(record_sets) > 1:
-        raise HubError(f"Multiple resource record sets found for {dns_name} in hosted zone {dns_zone_name}: {record_sets}")
-    elif len(record_sets) > 0:
-        record_set = record_sets[0]
-        if not allow_exists:
-            raise HubError(f"Record set for DNS name {dns_name} already exists in zone ID {hosted_zone_id}: {record_set}")
-        if resource_record_sets_are_equal(record_set, new_resource_record_set):
-            logger.debug(f"DNS name {dns_name} already exists and matches target {target}")
-            return
-        else:
-            if allow_overwrite:
-                logger.info(f"DNS name {dns_name} already exists and does not match target {target}; overwriting: {record_set}")
-            else:
-                raise HubError(f"DNS name {dns_name} already exists, but does not match target {target}: {record_set}")
-            
-    logger.debug(f"Creating/updating DNS name {dns_name} with target {target} in hosted zone {dns_zone_name}")
-    response = route53.change_resource_record_sets(
-        HostedZoneId=hosted_zone_id,
-        ChangeBatch=dict(
-            Changes=[
-                dict(
-                    Action='UPSERT',
-                    ResourceRecordSet=new_resource_record_set,
-                ),
-            ],
-        ),
+    apply_route53_dns_changes(
+        aws,
+        [ (dns_name, target, 'UPSERT') ],
+        verify_public_ip=verify_public_ip,
+        public_ip=public_ip,
+        allow_exists=allow_exists,
+        allow_overwrite=allow_overwrite,
+        ttl=ttl,
       )
-    logger.debug(f"DNS name {dns_name} successfully created/updated in hosted zone {dns_zone_name}: {response}")
@@ -12,14 +12,19 @@ from __future__ import annotations
 
 import os
 import sys
-import dotenv
+import io
 import json
 import re
-import urllib3
+import time
+import socket
+import struct
+import tempfile
 from functools import cache
 import copy
 import ipaddress
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from ruamel.yaml.comments import CommentedMap as YAMLContainer
 from tomlkit.container import Container as TOMLContainer
 
@@ -27,6 +32,19 @@ from .internal_types import *
 from .internal_types import _CMD, _FILE, _ENV
 from .pkg_logging import logger
 
+# urllib3 is only needed for the few functions that make HTTP requests, so it is
+# imported on first use rather than when tp_hub is imported.
+if TYPE_CHECKING:
+    import urllib3
+
+try:
+    # orjson is an optional, much faster drop-in JSON parser. Like json.loads, it accepts
+    # either str or UTF-8 bytes.
+    import orjson
+    _json_loads: Callable[[Union[str, bytes]], Any] = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 from project_init_tools.installer.docker import install_docker, docker_is_installed
 from project_init_tools.installer.docker_compose import install_docker_compose, docker_compose_is_installed
 from project_init_tools.installer.aws_cli import install_aws_cli, aws_cli_is_installed
@@ -39,8 +57,6 @@ from project_init_tools.util import (
     download_url_text,
 )
 
-from .internal_types import *
-
 def normalize_ip_address(addr: IPAddressOrStr) -> IPAddress:
     """
     Normalize an IP address to an IPAddress object
@@ -109,8 +125,76 @@ def is_ipv6_address(addr: IPAddressOrStr) -> bool:
     except ValueError:
         return False
         
+user_cache_ttl_seconds = 300.0
+"""How long a value saved in the user's cache directory (e.g., the public IP address) is reused by later runs"""
+
+def get_user_cache_dir() -> str:
+    """
+    Get the per-user cache directory for this package (~/.cache/tp_hub by default). The
+    directory is not created.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "tp_hub")
+
+def _read_user_cache_entry(filename: str) -> Optional[Jsonable]:
+    """
+    Read a value saved by _write_user_cache_entry(), if it was saved by this host less than
+    user_cache_ttl_seconds ago. Returns None if there is no such value.
+    """
+    cache_file = os.path.join(get_user_cache_dir(), filename)
+    try:
+        with open(cache_file, "r", encoding='utf-8') as f:
+            data = _json_loads(f.read())
+        if data["host"] == socket.gethostname() and time.time() - data["ts"] < user_cache_ttl_seconds:
+            return data["value"]
+    except (OSError, ValueError, TypeError, KeyError):
+        pass
+    return None
+
+def _write_user_cache_entry(filename: str, value: Jsonable) -> None:
+    """
+    Save a value in the user's cache directory for use by later runs. Failure to save is not an error.
+    """
+    cache_file = os.path.join(get_user_cache_dir(), filename)
+    tmp_file: Optional[str] = None
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding='utf-8', dir=cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_file = f.name
+            json.dump({ "host": socket.gethostname(), "ts": time.time(), "value": value }, f)
+        os.replace(tmp_file, cache_file)
+        tmp_file = None
+    except OSError as e:
+        logger.debug(f"Unable to save cached value to {cache_file}: {e}")
+    finally:
+        if tmp_file is not None:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+
 @cache
-def get_public_ipv4_egress_address() -> IPv4Address:
+def get_http_pool() -> urllib3.PoolManager:
+    """
+    Get a connection pool shared by all HTTP(S) requests made by this package, so that
+    repeated requests to the same host (e.g., DNS-over-HTTPS lookups) reuse open connections.
+    Transient failures are retried briefly. urllib3.PoolManager is thread-safe.
+    """
+    import urllib3
+    return urllib3.PoolManager(num_pools=4, maxsize=16, retries=urllib3.Retry(total=2, backoff_factor=0.1))
+
+def _pooled_download_url_text(url: str) -> str:
+    """
+    Download the text content of a URL using the shared connection pool
+    """
+    response = get_http_pool().request("GET", url)
+    if response.status != 200:
+        raise HubError(f"Failed to download {url}: {response.status} {response.reason}")
+    return response.data.decode("utf-8")
+
+@cache
+def get_public_ipv4_egress_address(force_refresh: bool=False) -> str:
     """
     Get the outgoing public IP4 address of this host by asking https://api.ipify.org/
     The result is the public IP address that is used for egress to the Internet over the default
@@ -118,17 +202,25 @@ def get_public_ipv4_egress_address() -> IPv4Address:
     If you are behind carrier-grade NAT, it will be the selected WAN IPV4 address of the carrier's NAT gateway.
     If you can use direct port-forwarding on your gateway router, this is the address you should use as
     your hub public IP address.
+
+    The result is saved in the user's cache directory, and reused for user_cache_ttl_seconds
+    by later runs unless force_refresh is True.
     """
+    if not force_refresh:
+        cached_result = _read_user_cache_entry("public_ipv4.json")
+        if isinstance(cached_result, str) and is_valid_ipv4_address(cached_result):
+            return cached_result
     try:
-        result = download_url_text("https://api.ipify.org/").strip()
+        result = _pooled_download_url_text("https://api.ipify.org/").strip()
         if result == "":
             raise HubError("https://api.ipify.org returned an empty string")
-        return result
     except Exception as e:
         raise HubError("Failed to get public IPv4 egress address") from e
+    _write_user_cache_entry("public_ipv4.json", result)
+    return result
 
 @cache
-def get_public_ipv6_egress_address() -> Optional[str]:
+def get_public_ipv6_egress_address(force_refresh: bool=False) -> Optional[str]:
     """
     Get the outgoing public IPv6 address of this host by asking https://api64.ipify.org/
     The result is the public IPv6 address that is used for egress to the Internet over the default
@@ -142,18 +234,30 @@ def get_public_ipv6_egress_address() -> Optional[str]:
     get_stable_public_ipv6_address() to get the stable address.
 
     Returns None if the host does not have a route to the Internet via IPv6.
+
+    The result (including None) is saved in the user's cache directory, and reused for
+    user_cache_ttl_seconds by later runs unless force_refresh is True.
     """
+    if not force_refresh:
+        cached_result = _read_user_cache_entry("public_ipv6.json")
+        if isinstance(cached_result, dict) and "address" in cached_result:
+            cached_address = cached_result["address"]
+            if cached_address is None or (isinstance(cached_address, str) and ':' in cached_address):
+                return cached_address
+    result: Optional[str]
     try:
-        result = download_url_text("https://api64.ipify.org/").strip()
+        result = _pooled_download_url_text("https://api64.ipify.org/").strip()
         if result == "":
             raise HubError("https://api64.ipify.org returned an empty string")
-        if not ':' in result:
+        if ':' not in result:
             # This is an IPv4 address, not IPv6, which means that no IPv6 route to the Internet
             # was found, and it fell back to IPv4
-            return None
-        return result
+            result = None
     except Exception as e:
         raise HubError("Failed to get public IPv6 egress address") from e
+    # Wrapped in an object, so that a saved None can be distinguished from no saved value
+    _write_user_cache_entry("public_ipv6.json", { "address": result })
+    return result
 
 @cache
 def get_stable_public_ipv6_address() -> Optional[str]:
@@ -185,6 +289,140 @@ def get_stable_public_ipv6_address() -> Optional[str]:
     """
     raise NotImplementedError("get_stable_public_ipv6_address() is not yet implemented")
 
+_NLMSG_ERROR = 2
+_RTM_NEWROUTE = 24
+_RTM_GETROUTE = 26
+_NLM_F_REQUEST = 1
+_RTA_DST = 1
+_RTA_OIF = 4
+_RTA_GATEWAY = 5
+_RTA_PREFSRC = 7
+
+def _get_socket_netlink_ipv4_route_output(remote_ipv4_addr: IPv4Address) -> Optional[str]:
+    """
+    Look up the route to a remote IPv4 address with a single RTM_GETROUTE request on a raw
+    AF_NETLINK socket (Linux only), formatted like the first line of "ip -o route get" output.
+
+    Returns None if the route has no gateway or source address.
+    Raises OSError if netlink is not available, or the kernel rejects the request.
+    """
+    # struct rtmsg: family, dst_len, src_len, tos, table, protocol, scope, type, flags
+    rtmsg = struct.pack("=BBBBBBBBI", socket.AF_INET, 32, 0, 0, 0, 0, 0, 0, 0)
+    # struct rtattr for RTA_DST, followed by the address
+    rta_dst = struct.pack("=HH", 8, _RTA_DST) + remote_ipv4_addr.packed
+    payload = rtmsg + rta_dst
+    # struct nlmsghdr: len, type, flags, seq, pid
+    request = struct.pack("=LHHLL", 16 + len(payload), _RTM_GETROUTE, _NLM_F_REQUEST, 1, 0) + payload
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+        sock.settimeout(2.0)
+        sock.send(request)
+        response = sock.recv(65536)
+    if len(response) < 16:
+        raise OSError("Short netlink response")
+    msg_len, msg_type = struct.unpack_from("=LH", response, 0)
+    if msg_type == _NLMSG_ERROR:
+        error = -struct.unpack_from("=i", response, 16)[0]
+        raise OSError(error, f"Netlink RTM_GETROUTE failed: {os.strerror(error)}")
+    if msg_type != _RTM_NEWROUTE:
+        raise OSError(f"Unexpected netlink message type {msg_type}")
+    attrs: Dict[int, bytes] = {}
+    offset = 16 + 12
+    msg_len = min(msg_len, len(response))
+    while offset + 4 <= msg_len:
+        rta_len, rta_type = struct.unpack_from("=HH", response, offset)
+        if rta_len < 4:
+            break
+        attrs[rta_type] = response[offset + 4:offset + rta_len]
+        offset += (rta_len + 3) & ~3
+    gateway = attrs.get(_RTA_GATEWAY)
+    src = attrs.get(_RTA_PREFSRC)
+    oif = attrs.get(_RTA_OIF)
+    if gateway is None or src is None or oif is None or len(gateway) != 4 or len(src) != 4 or len(oif) != 4:
+        return None
+    network_interface = socket.if_indextoname(struct.unpack("=I", oif)[0])
+    return f"{remote_ipv4_addr} via {IPv4Address(gateway)} dev {network_interface} src {IPv4Address(src)} uid {os.getuid()} "
+
+def _get_netlink_ipv4_route_output(remote_ipv4_addr: IPv4Address) -> Optional[str]:
+    """
+    Look up the route to a remote IPv4 address in-process over netlink, using pyroute2 if it
+    is installed, or a raw netlink socket otherwise. The result is formatted like the first
+    line of "ip -o route get" output, so it can be parsed (and saved) the same way.
+
+    Returns None if netlink is not available (e.g., not Linux) or the route has no gateway or
+    source address, in which case the caller should fall back to running the "ip" command.
+    """
+    try:
+        from pyroute2 import IPRoute  # type: ignore[import-not-found]
+    except ImportError:
+        try:
+            return _get_socket_netlink_ipv4_route_output(remote_ipv4_addr)
+        except (OSError, AttributeError, struct.error) as e:
+            # AttributeError: socket.AF_NETLINK does not exist on this platform
+            logger.debug(f"Netlink route lookup for {remote_ipv4_addr} failed; falling back to 'ip route': {e}")
+            return None
+    try:
+        with IPRoute() as ipr:
+            routes = ipr.route("get", dst=str(remote_ipv4_addr))
+            if len(routes) == 0:
+                return None
+            route = routes[0]
+            gateway = route.get_attr("RTA_GATEWAY")
+            src = route.get_attr("RTA_PREFSRC")
+            oif = route.get_attr("RTA_OIF")
+            if gateway is None or src is None or oif is None:
+                return None
+            links = ipr.get_links(oif)
+            if len(links) == 0:
+                return None
+            network_interface = links[0].get_attr("IFLA_IFNAME")
+    except Exception as e:
+        # pyroute2 raises its own NetlinkError, and OSError or ImportError-derived errors on
+        # platforms without netlink; any failure just means falling back to 'ip route'
+        logger.debug(f"pyroute2 route lookup for {remote_ipv4_addr} failed; falling back to 'ip route': {e}")
+        return None
+    return f"{remote_ipv4_addr} via {gateway} dev {network_interface} src {src} uid {os.getuid()} "
+
+def _get_netifaces_default_ipv4_route_output(remote_ipv4_addr: IPv4Address) -> Optional[str]:
+    """
+    Describe the default IPv4 route (which is the route to any Internet host) using netifaces
+    if it is installed, without running any subprocess. The result is formatted like the
+    first line of "ip -o route get" output for remote_ipv4_addr, so it can be parsed the same way.
+
+    Returns None if netifaces is not installed or there is no usable default IPv4 route, in which
+    case the caller should fall back to looking up the route.
+    """
+    try:
+        import netifaces  # type: ignore[import-untyped]
+    except ImportError:
+        return None
+    try:
+        gateway, network_interface = netifaces.gateways()["default"][netifaces.AF_INET][:2]
+        local_addr = netifaces.ifaddresses(network_interface)[netifaces.AF_INET][0]["addr"]
+    except (KeyError, IndexError, ValueError):
+        return None
+    return f"{remote_ipv4_addr} via {gateway} dev {network_interface} src {local_addr} uid {os.getuid()} "
+
+def _get_ip_route_fields(ip_route_output: str, keywords: Iterable[str]) -> Optional[Dict[str, str]]:
+    """
+    Extract the values that follow the given keywords in a line of "ip -o route get" output,
+    by splitting it into whitespace-separated tokens; e.g., for keywords ("via", "dev", "src"):
+
+            8.8.8.8 via 192.168.0.1 dev eth0 src 192.168.0.245 uid 1000 \    cache
+
+        yields { "via": "192.168.0.1", "dev": "eth0", "src": "192.168.0.245" }
+
+    Returns None if any of the keywords is missing or has no value.
+    """
+    tokens = ip_route_output.split()
+    result: Dict[str, str] = {}
+    try:
+        for keyword in keywords:
+            # The first token is the remote address, never a keyword
+            result[keyword] = tokens[tokens.index(keyword, 1) + 1]
+    except (ValueError, IndexError):
+        return None
+    return result
+
 class Ipv4RouteInfo:
     remote_ipv4_addr: IPv4Address
     """The IPv4 address of the remote host"""
@@ -198,9 +436,12 @@ class Ipv4RouteInfo:
     local_lan_ipv4_addr: IPv4Address
     """The LAN-local IPv4 address of this host on the route to the remote host"""
 
+    ip_route_output: str
+    """The line of "ip -o route get" output that this info was parsed from"""
+
     _ip_route_re = re.compile(r"^(?P<remote_addr>\d+\.\d+\.\d+\.\d+)\s+via\s+(?P<gateway_lan_ipv4_addr>\d+\.\d+\.\d+\.\d+)\s+dev\s+(?P<network_interface>.*[^\s])\s+src\s+(?P<local_lan_ipv4_addr>\d+\.\d+\.\d+\.\d+)\s+uid\s")
 
-    def __init__(self, remote_ipv4_addr: IPv4AddressOrStr):
+    def __init__(self, remote_ipv4_addr: IPv4AddressOrStr, ip_route_output: Optional[str]=None):
         """
         Get info about the route to a remote IPv4 address
         
@@ -209,19 +450,39 @@ class Ipv4RouteInfo:
 
                 $ ip -o route get 8.8.8.8
                 8.8.8.8 via 192.168.0.1 dev eth0 src 192.168.0.245 uid 1000 \    cache 
+
+        If ip_route_output is provided (e.g., a previously saved ip_route_output), it is parsed
+        instead of running the "ip" command. If pyroute2 is installed, the route is looked up
+        over netlink without running the "ip" command.
         """
         
         self.remote_ipv4_addr = normalize_ipv4_address(remote_ipv4_addr)
-        response = sudo_check_output_stderr_exception(
-            ["ip", "-o", "route", "get", str(self.remote_ipv4_addr)],
-            use_sudo=False,
-        ).decode("utf-8").split('\n')[0].rstrip()
-        match = self._ip_route_re.match(response)
-        if match is None:
-            raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv4_addr}: '{response}'")
-        self.gateway_lan_ipv4_addr = normalize_ipv4_address(match.group("gateway_lan_ipv4_addr"))
-        self.network_interface = match.group("network_interface")
-        self.local_lan_ipv4_addr = normalize_ipv4_address(match.group("local_lan_ipv4_addr"))
+        if ip_route_output is None:
+            ip_route_output = _get_netlink_ipv4_route_output(self.remote_ipv4_addr)
+        if ip_route_output is None:
+            ip_route_output = sudo_check_output_stderr_exception(
+                ["ip", "-o", "route", "get", str(self.remote_ipv4_addr)],
+                use_sudo=False,
+            ).decode("utf-8").partition('\n')[0].rstrip()
+        response = ip_route_output
+        self.ip_route_output = response
+        fields = _get_ip_route_fields(response, ("via", "dev", "src"))
+        if fields is None:
+            # Fall back to the stricter regular expression
+            match = self._ip_route_re.match(response)
+            if match is None:
+                raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv4_addr}: '{response}'")
+            fields = dict(
+                via=match.group("gateway_lan_ipv4_addr"),
+                dev=match.group("network_interface"),
+                src=match.group("local_lan_ipv4_addr"),
+              )
+        try:
+            self.gateway_lan_ipv4_addr = normalize_ipv4_address(fields["via"])
+            self.local_lan_ipv4_addr = normalize_ipv4_address(fields["src"])
+        except ValueError as e:
+            raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv4_addr}: '{response}'") from e
+        self.network_interface = fields["dev"]
 
 
 class Ipv6RouteInfo:
@@ -237,7 +498,7 @@ class Ipv6RouteInfo:
     egress_ipv6_addr: IPv6Address
     """IPv6 address of this host on the route to the remote host"""
 
-    ip_route_re = re.compile(r"^(?P<remote_ipv6_addr>[0-9a-f:]+)\s+from\s+(?P<from_ipv6_addr>[0-9a-f:]+)\s+via\s+(?P<gateway_lan_ipv6_addr>[0-9a-f:]+)\s+dev\s+(?P<network_interface>\S+)\s+((proto\s+\S+)\s+)*src\s+(?P<egress_ipv6_addr>[0-9a-f:]+)\s")
+    _ip_route_re = re.compile(r"^(?P<remote_ipv6_addr>[0-9a-f:]+)\s+from\s+(?P<from_ipv6_addr>[0-9a-f:]+)\s+via\s+(?P<gateway_lan_ipv6_addr>[0-9a-f:]+)\s+dev\s+(?P<network_interface>\S+)\s+((proto\s+\S+)\s+)*src\s+(?P<egress_ipv6_addr>[0-9a-f:]+)\s")
 
     def __init__(self, remote_ipv6_addr: IPv6AddressOrStr):
         """
@@ -253,13 +514,24 @@ class Ipv6RouteInfo:
         response = sudo_check_output_stderr_exception(
             ["ip", "-o", "route", "get", str(self.remote_ipv6_addr)],
             use_sudo=False,
-        ).decode("utf-8").split('\n')[0].rstrip()
-        match = self._ip_route_re.match(response)
-        if match is None:
-            raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv4_addr}: '{response}'")
-        self.gateway_lan_ipv6_addr = normalize_ipv6_address(match.group("gateway_lan_ipv6_addr"))
-        self.network_interface = match.group("network_interface")
-        self.egress_ipv6_addr = normalize_ipv4_address(match.group("egress_ipv6_addr"))
+        ).decode("utf-8").partition('\n')[0].rstrip()
+        fields = _get_ip_route_fields(response, ("via", "dev", "src"))
+        if fields is None:
+            # Fall back to the stricter regular expression
+            match = self._ip_route_re.match(response)
+            if match is None:
+                raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv6_addr}: '{response}'")
+            fields = dict(
+                via=match.group("gateway_lan_ipv6_addr"),
+                dev=match.group("network_interface"),
+                src=match.group("egress_ipv6_addr"),
+              )
+        try:
+            self.gateway_lan_ipv6_addr = normalize_ipv6_address(fields["via"])
+            self.egress_ipv6_addr = normalize_ipv6_address(fields["src"])
+        except ValueError as e:
+            raise HubError(f"Failed to parse output of 'ip -o route get {self.remote_ipv6_addr}: '{response}'") from e
+        self.network_interface = fields["dev"]
 
 
 @cache
@@ -276,8 +548,25 @@ def get_internet_ipv4_route_info() -> Ipv4RouteInfo:
 
     An arbitrary internet host address (Google's name servers) is used to determine the route.
 
+    If netifaces is installed, the default route is read from it directly. Otherwise, the
+    "ip route" output is saved in the user's cache directory, and reused for
+    user_cache_ttl_seconds by later runs.
     """
-    return Ipv4RouteInfo("8.8.8.8")
+    netifaces_output = _get_netifaces_default_ipv4_route_output(IPv4Address("8.8.8.8"))
+    if netifaces_output is not None:
+        try:
+            return Ipv4RouteInfo("8.8.8.8", ip_route_output=netifaces_output)
+        except HubError:
+            pass
+    cached_output = _read_user_cache_entry("internet_ipv4_route.json")
+    if isinstance(cached_output, str):
+        try:
+            return Ipv4RouteInfo("8.8.8.8", ip_route_output=cached_output)
+        except HubError:
+            pass
+    result = Ipv4RouteInfo("8.8.8.8")
+    _write_user_cache_entry("internet_ipv4_route.json", result.ip_route_output)
+    return result
 
 @cache
 def get_lan_ipv4_address() -> IPv4Address:
@@ -354,28 +643,46 @@ def get_default_ipv6_interface() -> str:
     info = get_internet_ipv4_route_info()
     return info.network_interface
 
+# Any run of line breaks and surrounding whitespace (including blank lines) between ndjson records.
+# JSON text never contains a raw line break inside a value, so this only matches between records.
+_ndjson_record_separator_re = re.compile(r"\s*\n\s*")
+
 def loads_ndjson(text: str) -> List[JsonableDict]:
     """
     Parse a string containing newline-delimited JSON into a list of objects
     """
-    result: List[JsonableDict] = list(json.loads(line) for line in text.split("\n") if line != "")
-    assert isinstance(result, list)
+    # Rewriting the record separators as commas and wrapping the result in a JSON array lets the
+    # whole document be parsed with a single json.loads() call, without building a list of lines.
+    result: List[JsonableDict] = _json_loads("[" + _ndjson_record_separator_re.sub(",", text.strip()) + "]")
     return result
 
+def copy_jsonable(value: Jsonable) -> Jsonable:
+    """
+    Return a deep copy of a plain JSON-like value (nested dicts and lists of scalars).
+
+    Much cheaper than copy.deepcopy for such values: only the dicts and lists are copied,
+    immutable scalars are shared, and there is no memo bookkeeping.
+    """
+    if isinstance(value, dict):
+        return { k: copy_jsonable(v) for k, v in value.items() }
+    if isinstance(value, list):
+        return [ copy_jsonable(v) for v in value ]
+    return value
+
 def ndjson_to_dict(text:str, key_name: str="Name") -> Dict[str, JsonableDict]:
     """
     Parse a string containing newline-delimited JSON objects, each with a key property,
     into a dictionary of objects.
     """
-    data = loads_ndjson(text)
     result: Dict[str, JsonableDict] = {}
-    for item in data:
+    # Each item is validated as it is added, in a single pass
+    for item in loads_ndjson(text):
         if not isinstance(item, dict):
             raise HubError("ndjson Object is not a dictionary")
         key = item.get(key_name)
-        if key is None:
-            raise HubError(f"ndjson Object is missing key {key_name}")
         if not isinstance(key, str):
+            if key is None:
+                raise HubError(f"ndjson Object is missing key {key_name}")
             raise HubError(f"ndjson Object key {key_name} is not a string")
         result[key] = item
     return result
@@ -441,58 +748,249 @@ def docker_call_output(
     return result_bytes.decode("utf-8")
 
 @cache
+def _get_docker_sdk_client() -> Optional[Any]:
+    """
+    Get a client for the docker Python SDK, which talks directly to the docker daemon's socket
+    instead of starting the docker CLI for each operation.
+
+    Returns None if the docker SDK is not installed, or the daemon cannot be reached with it
+    (e.g., the login session is not yet in the "docker" group), in which case the docker CLI
+    (which can use sudo) should be used instead.
+    """
+    try:
+        import docker  # type: ignore[import-untyped]
+    except ImportError:
+        return None
+    try:
+        client = docker.from_env()
+        client.ping()
+    except Exception as e:
+        logger.debug(f"Docker SDK cannot reach the docker daemon; using the docker CLI: {e}")
+        return None
+    return client
+
+def _list_docker_networks() -> Dict[str, JsonableDict]:
+    client = _get_docker_sdk_client()
+    if client is None:
+        return ndjson_to_dict(docker_call_output(["network", "ls", "--format", "json"]))
+    # Use the same property names as "docker network ls --format json"
+    return {
+        network.name: dict(
+            Name=network.name,
+            ID=network.short_id,
+            Driver=network.attrs.get("Driver", ""),
+            Scope=network.attrs.get("Scope", ""),
+          ) for network in client.networks.list()
+      }
+
+def _create_docker_network(name: str, driver: str) -> None:
+    client = _get_docker_sdk_client()
+    if client is None:
+        docker_call(["network", "create", "--driver", driver, name])
+    else:
+        client.networks.create(name, driver=driver)
+
+def _inspect_docker_network_exists(name: str) -> bool:
+    client = _get_docker_sdk_client()
+    if client is None:
+        try:
+            docker_call_output(["network", "inspect", "--format", "{{.Name}}", name])
+        except subprocess.CalledProcessError:
+            return False
+        return True
+    import docker.errors  # type: ignore[import-untyped]
+    try:
+        client.networks.get(name)
+    except docker.errors.NotFound:
+        return False
+    return True
+
+def _list_docker_volumes() -> Dict[str, JsonableDict]:
+    client = _get_docker_sdk_client()
+    if client is None:
+        return ndjson_to_dict(docker_call_output(["volume", "ls", "--format", "json"]))
+    # Use the same property names as "docker volume ls --format json"
+    return {
+        volume.name: dict(
+            Name=volume.name,
+            Driver=volume.attrs.get("Driver", ""),
+            Scope=volume.attrs.get("Scope", ""),
+            Mountpoint=volume.attrs.get("Mountpoint", ""),
+          ) for volume in client.volumes.list()
+      }
+
+def _create_docker_volume(name: str) -> None:
+    client = _get_docker_sdk_client()
+    if client is None:
+        docker_call(["volume", "create", name])
+    else:
+        client.volumes.create(name)
+
+def _inspect_docker_volume_exists(name: str) -> bool:
+    client = _get_docker_sdk_client()
+    if client is None:
+        try:
+            docker_call_output(["volume", "inspect", "--format", "{{.Name}}", name])
+        except subprocess.CalledProcessError:
+            return False
+        return True
+    import docker.errors  # type: ignore[import-untyped]
+    try:
+        client.volumes.get(name)
+    except docker.errors.NotFound:
+        return False
+    return True
+
+# Caches of existing docker networks and volumes, by name. Each cache is filled on first use and
+# kept current when this module creates a network or volume, rather than being discarded and
+# relisted. If a create fails, the cache is discarded since the resulting state is unknown.
+_docker_networks: Optional[Dict[str, JsonableDict]] = None
+_docker_networks_lock = Lock()
+_docker_volumes: Optional[Dict[str, JsonableDict]] = None
+_docker_volumes_lock = Lock()
+
 def get_docker_networks() -> Dict[str, JsonableDict]:
     """
     Get all docker networks
     """
-    data_json = docker_call_output(
-        ["network", "ls", "--format", "json"],
-      )
-    result = ndjson_to_dict(data_json)
+    global _docker_networks
+    with _docker_networks_lock:
+        if _docker_networks is None:
+            _docker_networks = _list_docker_networks()
+        result = _docker_networks
     return result
 
 def refresh_docker_networks() -> None:
     """
     Refresh the cache of docker networks
     """
-    get_docker_networks.cache_clear()
+    global _docker_networks
+    with _docker_networks_lock:
+        _docker_networks = None
+
+def _add_cached_docker_networks(names: Iterable[str], driver: str) -> None:
+    with _docker_networks_lock:
+        if _docker_networks is not None:
+            for name in names:
+                _docker_networks[name] = { "Name": name, "Driver": driver }
+
+def _docker_network_exists(name: str) -> bool:
+    """
+    Return True if a docker network exists. If the networks have not already been listed,
+    only the one network is inspected.
+    """
+    with _docker_networks_lock:
+        networks = _docker_networks
+    if networks is not None:
+        return name in networks
+    return _inspect_docker_network_exists(name)
 
 def create_docker_network(name: str, driver: str="bridge", allow_existing: bool=True) -> None:
     """
     Create a docker network
     """
-    if not (allow_existing and name in get_docker_networks()):
+    if not (allow_existing and _docker_network_exists(name)):
         try:
-            docker_call(["network", "create", "--driver", driver, name])
-        finally:
+            _create_docker_network(name, driver)
+        except BaseException:
             refresh_docker_networks()
+            raise
+        _add_cached_docker_networks([name], driver)
+
+def create_docker_networks(names: Iterable[str], driver: str="bridge", allow_existing: bool=True) -> None:
+    """
+    Create multiple docker networks. The existing networks are listed at most once, and only
+    missing networks are created (concurrently).
+    """
+    existing = get_docker_networks() if allow_existing else {}
+    missing = [ name for name in dict.fromkeys(names) if name not in existing ]
+    if len(missing) > 0:
+        try:
+            with ThreadPoolExecutor(max_workers=min(4, len(missing))) as executor:
+                for _ in executor.map(lambda name: _create_docker_network(name, driver), missing):
+                    pass
+        except BaseException:
+            refresh_docker_networks()
+            raise
+        _add_cached_docker_networks(missing, driver)
 
-@cache
 def get_docker_volumes() -> Dict[str, JsonableDict]:
     """
     Get all docker volumes
     """
-    data_json = docker_call_output(
-        ["volume", "ls", "--format", "json"],
-      )
-    result = ndjson_to_dict(data_json)
+    global _docker_volumes
+    with _docker_volumes_lock:
+        if _docker_volumes is None:
+            _docker_volumes = _list_docker_volumes()
+        result = _docker_volumes
     return result
 
 def refresh_docker_volumes() -> None:
     """
     Refresh the cache of docker volumes
     """
-    get_docker_volumes.cache_clear()
+    global _docker_volumes
+    with _docker_volumes_lock:
+        _docker_volumes = None
+
+def _add_cached_docker_volumes(names: Iterable[str]) -> None:
+    with _docker_volumes_lock:
+        if _docker_volumes is not None:
+            for name in names:
+                _docker_volumes[name] = { "Name": name, "Driver": "local" }
+
+def _docker_volume_exists(name: str) -> bool:
+    """
+    Return True if a docker volume exists. If the volumes have not already been listed,
+    only the one volume is inspected.
+    """
+    with _docker_volumes_lock:
+        volumes = _docker_volumes
+    if volumes is not None:
+        return name in volumes
+    return _inspect_docker_volume_exists(name)
 
 def create_docker_volume(name: str, allow_existing: bool=True) -> None:
     """
     Create a docker volume
     """
-    if not (allow_existing and name in get_docker_volumes()):
+    if not (allow_existing and _docker_volume_exists(name)):
+        try:
+            _create_docker_volume(name)
+        except BaseException:
+            refresh_docker_volumes()
+            raise
+        _add_cached_docker_volumes([name])
+
+def create_docker_volumes(names: Iterable[str], allow_existing: bool=True) -> None:
+    """
+    Create multiple docker volumes. The existing volumes are listed at most once, and only
+    missing volumes are created (concurrently).
+    """
+    existing = get_docker_volumes() if allow_existing else {}
+    missing = [ name for name in dict.fromkeys(names) if name not in existing ]
+    if len(missing) > 0:
         try:
-            docker_call(["volume", "create", name])
-        finally:
+            with ThreadPoolExecutor(max_workers=min(4, len(missing))) as executor:
+                for _ in executor.map(_create_docker_volume, missing):
+                    pass
+        except BaseException:
             refresh_docker_volumes()
+            raise
+        _add_cached_docker_volumes(missing)
+
+def prefetch_docker_state() -> None:
+    """
+    Populate the caches of docker networks and docker volumes, running the two
+    "docker ... ls" commands concurrently. Subsequent calls to get_docker_networks(),
+    get_docker_volumes(), create_docker_network(), and create_docker_volume() will
+    not need to wait for docker unless they modify the state.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        networks_future = executor.submit(get_docker_networks)
+        volumes_future = executor.submit(get_docker_volumes)
+        networks_future.result()
+        volumes_future.result()
 
 def docker_compose_call(
         args: List[str],
@@ -532,19 +1030,81 @@ def docker_compose_call_output(
         stderr_exception=stderr_exception,
       )
 
-def raw_resolve_public_dns(public_dns: str, record_type: Optional[Union[int, str]]=None) -> JsonableDict:
+def docker_compose_call_many(
+        calls: Iterable[Tuple[List[str], Optional[_ENV], Optional[StrOrBytesPath]]],
+        stderr_exception: bool=True,
+        max_workers: int=4,
+      ) -> None:
+    """
+    Make several independent docker-compose calls concurrently; e.g., to bring multiple
+    stacks up or down at once. Each call is an (args, env, cwd) tuple, as would be passed
+    to docker_compose_call.
+    All of the calls are allowed to complete; then the first failure (in order), if any, is raised.
+    """
+    call_list = list(calls)
+    if len(call_list) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(call_list))) as executor:
+        futures = [
+            executor.submit(docker_compose_call, args, env=env, cwd=cwd, stderr_exception=stderr_exception)
+                for args, env, cwd in call_list
+          ]
+    for future in futures:
+        future.result()
+
+_max_public_dns_cache_entries = 4096
+"""The maximum number of responses kept in _public_dns_cache; the oldest are dropped first"""
+
+_public_dns_cache_lock = Lock()
+_public_dns_cache: Dict[Tuple[str, Optional[str], str], Tuple[float, JsonableDict]] = {}
+"""Successful raw_resolve_public_dns() responses, keyed by (public_dns, record_type, resolver_url),
+   with the time.monotonic() at which each expires according to the records' TTLs"""
+
+def raw_resolve_public_dns(
+        public_dns: str,
+        record_type: Optional[Union[int, str]]=None,
+        resolver_url: str="https://dns.google/resolve",
+      ) -> JsonableDict:
     """
     Resolve a public DNS name to DNS record info. Bypasses all host files, mDNS, intranet DNS servers etc.
     By default fetches A records.
+
+    resolver_url may be any DNS-over-HTTPS resolver that supports the JSON API (e.g.,
+    "https://dns.google/resolve" or "https://cloudflare-dns.com/dns-query").
+
+    Responses with answers are cached in-process until the shortest TTL of the answers
+    expires. Failures and empty responses are not cached, so a name that is about to be
+    created can be polled.
     """
-    http = urllib3.PoolManager()
+    cache_key = (public_dns, None if record_type is None else str(record_type), resolver_url)
+    with _public_dns_cache_lock:
+        cached = _public_dns_cache.get(cache_key)
+    if cached is not None and cached[0] > time.monotonic():
+        # Callers own their result and may mutate it, so never hand out the cached object
+        return copy_jsonable(cached[1])
+    http = get_http_pool()
     fields: Dict[str, str] = dict(name=public_dns)
     if record_type is not None:
         fields["type"] = str(record_type)
-    response = http.request("GET", "https://dns.google/resolve", fields=fields)
+    response = http.request("GET", resolver_url, fields=fields, headers={ "accept": "application/dns-json" })
     if response.status != 200:
         raise HubError(f"Failed to resolve public DNS name {public_dns}: {response.status} {response.reason}")
-    data: JsonableDict = json.loads(response.data.decode("utf-8"))
+    # Parsed directly from the response bytes, without decoding to a str first
+    data: JsonableDict = _json_loads(response.data)
+    answers = data.get("Answer")
+    if data.get("Status") == 0 and isinstance(answers, list) and len(answers) > 0:
+        ttls = [ answer.get("TTL", 0) if isinstance(answer, dict) else 0 for answer in answers ]
+        ttl = min(ttl if isinstance(ttl, int) else 0 for ttl in ttls)
+        if ttl > 0:
+            now = time.monotonic()
+            with _public_dns_cache_lock:
+                for key in [ k for k, v in _public_dns_cache.items() if v[0] <= now ]:
+                    del _public_dns_cache[key]
+                _public_dns_cache.pop(cache_key, None)
+                while len(_public_dns_cache) >= _max_public_dns_cache_entries:
+                    del _public_dns_cache[next(iter(_public_dns_cache))]
+                _public_dns_cache[cache_key] = (now + ttl, data)
+            return copy_jsonable(data)
     return data
 
 def resolve_public_dns(
@@ -564,14 +1124,17 @@ def resolve_public_dns(
     if allow_ipv4:
         record_types.append("A")
     results: List[str] = []
-    for record_type in record_types:
-        data = raw_resolve_public_dns(public_dns, record_type=record_type)
-        if not "Status" in data:
+    # Each record type is a separate DNS-over-HTTPS request, so they are made concurrently. Responses
+    # are still processed in order, and the first failure (in order) is raised.
+    with ThreadPoolExecutor(max_workers=len(record_types)) as executor:
+        datas = list(executor.map(lambda record_type: raw_resolve_public_dns(public_dns, record_type=record_type), record_types))
+    for data in datas:
+        if "Status" not in data:
             raise HubError(f"Failed to resolve public DNS name {public_dns}: No Status in response")
         if data["Status"] != 3:
             if data["Status"] != 0:
                 raise HubError(f"Failed to resolve public DNS name {public_dns}: Status {data['Status']}")
-            if not "Answer" in data:
+            if "Answer" not in data:
                 raise HubError(f"Failed to resolve public DNS name {public_dns}: No Answer in response")
             answers = data["Answer"]
             if not isinstance(answers, list):
@@ -579,10 +1142,10 @@ def resolve_public_dns(
             for answer in answers:
                 if not isinstance(answer, dict):
                     raise HubError(f"Failed to resolve public DNS name {public_dns}: Answer entry is not a dictionary")
-                if not "type" in answer:
+                if "type" not in answer:
                     raise HubError(f"Failed to resolve public DNS name {public_dns}: Answer entry is missing type field")
                 if answer["type"] == 1:
-                    if not "data" in answer:
+                    if "data" not in answer:
                         raise HubError(f"Failed to resolve public DNS name {public_dns}: Answer entry is missing data field")
                     result = answer["data"]
                     if not isinstance(result, str):
@@ -592,6 +1155,53 @@ def resolve_public_dns(
         raise HubError(f"Failed to resolve public DNS name {public_dns}: No A records found")
     return results
 
+def resolve_public_dns_many(
+        public_dns_names: Iterable[str],
+        error_on_empty: bool = True,
+        allow_ipv6: bool=True,
+        allow_ipv4: bool=True,
+        max_workers: int=8,
+      ) -> Dict[str, List[IPAddress]]:
+    """
+    Resolve multiple public DNS names concurrently, as with resolve_public_dns(). The lookups
+    share the module's HTTP connection pool, so connections to the resolver are reused.
+
+    Returns a dictionary mapping each DNS name to its resolved IP addresses. If any lookup fails,
+    the first failure (in order) is raised.
+    """
+    names = list(dict.fromkeys(public_dns_names))
+    if len(names) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as executor:
+        results = list(executor.map(
+            lambda name: resolve_public_dns(
+                name,
+                error_on_empty=error_on_empty,
+                allow_ipv6=allow_ipv6,
+                allow_ipv4=allow_ipv4,
+              ),
+            names))
+    return dict(zip(names, results))
+
+def buffer_stderr() -> None:
+    """
+    Make sys.stderr line-buffered rather than unbuffered for the rest of the run, so that each
+    complete message is written with a single write, but is still written before any
+    following subprocess or sudo prompt can produce output. Partial lines (e.g., prompts)
+    must be flushed explicitly. The stream, its encoding and its error handler are unchanged.
+    Does nothing if sys.stderr has been replaced with something other than a TextIOWrapper
+    (e.g., by a test harness).
+    """
+    if isinstance(sys.stderr, io.TextIOWrapper):
+        sys.stderr.reconfigure(line_buffering=True, write_through=False)
+
+def emit(*lines: str) -> None:
+    """
+    Write lines to stderr with a single write and flush
+    """
+    sys.stderr.write("\n".join(lines) + "\n")
+    sys.stderr.flush()
+
 def unindent_text(
         text: str,
         reindent: int=0,
@@ -669,8 +1279,9 @@ def unindent_string_literal(
       )
 
 # A DNS name part can be 1 to 63 characters long, and can contain only letters, digits, and hyphens.
-# It must not start or end with a hyphen.
-_valid_dns_name_part_re = re.compile("^(?!-)[a-zA-Z\d-]{1,63}(?<!-)$")
+# It must not start or end with a hyphen. A DNS name (matched against the lowercased name) must have
+# at least two parts, since the TLD is never used alone.
+_valid_dns_name_re = re.compile(r"(?!-)[a-z\d-]{1,63}(?<!-)(\.(?!-)[a-z\d-]{1,63}(?<!-))+")
 def is_valid_dns_name(dns_name: str) -> bool:
     """
     Check if a string is a valid DNS name. The name does not need to exist.
@@ -683,18 +1294,13 @@ def is_valid_dns_name(dns_name: str) -> bool:
         # Fully qualified DNS names may end in '.' to indicate they are fully
         # qualified. Strip the trailing '.' before validating.
         dns_name = dns_name[:-1]
-    parts = dns_name.split(".")
-    if len(parts) < 2:
-        # A DNS name must have at least two parts, since the TLD is never used
-        # alone.
-        return False
-    if not all(_valid_dns_name_part_re.match(x) for x in parts):
-        # Each part must be 1-63 characters long, contain only letters, digits, and hyphens,
-        # and must not start or end with a hyphen.
+    if _valid_dns_name_re.fullmatch(dns_name) is None:
+        # There must be at least two parts, and each part must be 1-63 characters long,
+        # contain only letters, digits, and hyphens, and must not start or end with a hyphen.
         return False
     # The last part must be a TLD, which is never numeric. This test excludes IPV4
     # addresses from being considered valid DNS names.
-    if all(x.isdigit() for x in parts[-1]):
+    if dns_name.rsplit(".", 1)[-1].isdigit():
         return False
     return True
 
@@ -726,7 +1332,7 @@ def is_valid_email_address(name: str) -> bool:
         return False
     if not is_valid_dns_name(parts[1]):
         return False
-    if not _valid_email_username_re.match(parts[0]):
+    if _valid_email_username_re.fullmatch(parts[0]) is None:
         return False
     return True
 
@@ -34,8 +34,10 @@ def x_dotenv_load_file(pathname: str) -> OrderedDict[str, str]:
     """
     Load content of .env (as a file) into an OrderedDict
     """
+    # Read the whole file at once rather than letting the parser pull it line by line
     with open(pathname, 'r', encoding="utf-8") as fd:
-        return dotenv.dotenv_values(stream=fd)
+        content = fd.read()
+    return x_dotenv_loads(content)
 
 _unquoted_safe_re = re.compile(r'^[a-zA-Z0-9_.:\-]+$')
 def _x_dotenv_encode_name_value(name: str, value: str) -> str:
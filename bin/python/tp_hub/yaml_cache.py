@@ -0,0 +1,58 @@
+#
+# Copyright (c) 2023 Samuel J. McKelvie
+#
+# MIT License - See LICENSE file accompanying this package.
+#
+
+"""
+Content-hash checked in-process cache of parsed YAML files
+"""
+
+from __future__ import annotations
+
+import os
+import hashlib
+import yaml
+from collections import OrderedDict
+from threading import Lock
+
+from .internal_types import *
+from .yaml_template import yaml_safe_loader
+
+_max_parsed_yaml_entries = 16
+"""The maximum number of files whose parsed content is kept; the least recently used is dropped"""
+
+_parsed_yaml_by_path: OrderedDict[str, Tuple[str, Any]] = OrderedDict()
+"""Map of absolute pathname to (content digest, parsed content), in least to most recently used order"""
+
+_parsed_yaml_lock = Lock()
+
+def load_yaml_file_cached(pathname: str, encoding: str='utf-8') -> Any:
+    """
+    Safe-load a YAML file, reusing the previous parse of the same file if its content has
+    not changed.
+
+    The file is always read, and its content hash (blake2b) is compared against the
+    cached entry for that path, which is replaced when the content changes. Only a small,
+    bounded number of files are kept, and only in this process. The result is shared;
+    callers must copy it before mutating it.
+    """
+    with open(pathname, "rb") as f:
+        raw = f.read()
+    hasher = hashlib.blake2b(encoding.encode('ascii'), digest_size=16)
+    hasher.update(b'\0')
+    hasher.update(raw)
+    digest = hasher.hexdigest()
+    key = os.path.abspath(pathname)
+    with _parsed_yaml_lock:
+        entry = _parsed_yaml_by_path.get(key)
+        if entry is not None and entry[0] == digest:
+            _parsed_yaml_by_path.move_to_end(key)
+            return entry[1]
+    data = yaml.load(raw.decode(encoding), Loader=yaml_safe_loader)
+    with _parsed_yaml_lock:
+        _parsed_yaml_by_path[key] = (digest, data)
+        _parsed_yaml_by_path.move_to_end(key)
+        while len(_parsed_yaml_by_path) > _max_parsed_yaml_entries:
+            _parsed_yaml_by_path.popitem(last=False)
+    return data
@@ -18,11 +18,18 @@ from .internal_types import *
 from .internal_types import _CMD, _FILE, _ENV
 from .pkg_logging import logger
 
+try:
+    # libyaml's C loader parses the same safe subset several times faster than the
+    # pure-Python SafeLoader; fall back to the latter when PyYAML was built without it.
+    from yaml import CSafeLoader as yaml_safe_loader
+except ImportError:
+    from yaml import SafeLoader as yaml_safe_loader  # type: ignore[assignment]
+
 def load_yaml_template_str(template_str: str, env: Optional[Dict[str, str]]= None) -> JsonableDict:
     if env is None:
         env = dict(os.environ)
     expanded = string.Template(template_str).substitute(env)
-    result = yaml.safe_load(expanded)
+    result = yaml.load(expanded, Loader=yaml_safe_loader)
     return result
 
 def load_yaml_template_file(template_file: str, env: Optional[Dict[str, str]]= None) -> JsonableDict: